@@ -0,0 +1,231 @@
+"""Rerun-latency benchmarks for weekly_schedule.py driven by synthetic weeks.
+
+Each scenario seeds session state with a generated week, goal colours and
+template library, then times full script reruns for the common interactions
+through Streamlit's AppTest. One JSON object per (scenario, interaction) is
+appended to the output file.
+
+    python benchmarks/bench_reruns.py --tasks-per-day 5,20 --goals 10,2000 --templates 0,500
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from planner import COLOR_PALETTE, DAYS, Task, Template, Week, dump_templates
+from planner.store import TemplateStore
+
+APP = os.path.join(ROOT, "weekly_schedule.py")
+
+# Session id of every benchmark app, whose template library each scenario seeds
+BENCH_SESSION = "b" * 32
+
+
+def synthetic_goals(count):
+    """Goal name -> colour mapping with count distinct multi-word goals"""
+    return {
+        f"Goal {i} focus block": COLOR_PALETTE[i % len(COLOR_PALETTE)]
+        for i in range(count)
+    }
+
+
+def synthetic_week(tasks_per_day, focus_hours, goals):
+    """Week where every day holds tasks_per_day one-hour tasks drawn from goals"""
+    names = list(goals) or ["Deep work"]
+    week = Week()
+    for d, day in enumerate(DAYS):
+        week.set_focus_hours(day, focus_hours)
+        for t in range(tasks_per_day):
+            name = names[(d * tasks_per_day + t) % len(names)]
+            week.add_task(day, Task(1, name, goals.get(name, COLOR_PALETTE[0])))
+    return week
+
+
+def synthetic_templates(count, week, goals):
+    template = Template.from_week(week, goals)
+    return {f"Template {i:05d}": template for i in range(count)}
+
+
+class FakeUpload(io.BytesIO):
+    """Stands in for st.file_uploader's UploadedFile, which AppTest cannot drive"""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.file_id = f"bench-{len(data)}"
+        self.size = len(data)
+
+
+def new_app(week, goals):
+    """AppTest with a seeded session, already run once so caches reflect steady state"""
+    at = AppTest.from_file(APP, default_timeout=300)
+    at.session_state["session_id"] = BENCH_SESSION
+    at.session_state["week"] = week.copy()
+    at.session_state["goal_colors"] = dict(goals)
+    at.run()
+    return at
+
+
+def click(at, label_part):
+    next(b for b in at.button if label_part in b.label).click()
+
+
+def interaction_rerun(at):
+    """A rerun triggered by nothing relevant to the schedule"""
+
+
+def interaction_add_task(at):
+    next(t for t in at.text_input if t.label == "Task name:").input("Goal 3 focus block extra")
+    click(at, "Add Task")
+
+
+def edit_first_task(rows):
+    """The task table with its first row renamed and lengthened by an hour"""
+    rows = rows.copy()
+    if len(rows):
+        rows.loc[rows.index[0], "task"] = "Goal 3 focus block edited"
+        rows.loc[rows.index[0], "hours"] += 1
+    return rows
+
+
+def interaction_edit_task(at):
+    click(at, "Apply Changes")
+
+
+def interaction_switch_day(at):
+    at.selectbox(key="day_select").select(DAYS[1])
+
+
+def interaction_load_template(at):
+    at.selectbox(key="template_selector").select("Template 00000")
+    at.run()
+    click(at, "Load Template")
+
+
+def interaction_copy_week(at):
+    click(at, "Copy to Entire Week")
+
+
+def interaction_import_file(at):
+    click(at, "Import All")
+
+
+INTERACTIONS = {
+    "rerun": interaction_rerun,
+    "add_task": interaction_add_task,
+    "edit_task": interaction_edit_task,
+    "switch_day": interaction_switch_day,
+    "load_template": interaction_load_template,
+    "copy_week": interaction_copy_week,
+    "import_file": interaction_import_file,
+}
+
+
+def run_scenario(scenario, interactions, repeat, store_dir):
+    """Time each interaction repeat times for one scenario"""
+    goals = synthetic_goals(scenario["goals"])
+    week = synthetic_week(scenario["tasks_per_day"], scenario["focus_hours"], goals)
+    library = synthetic_templates(scenario["templates"], week, goals)
+
+    store_path = os.path.join(store_dir, "bench_{tasks_per_day}_{goals}_{templates}_{focus_hours}.db".format(**scenario))
+    os.environ["PLANNER_TEMPLATE_DB"] = store_path
+    st.cache_resource.clear()
+    TemplateStore(store_path, owner=BENCH_SESSION).replace_all(library or synthetic_templates(1, week, goals))
+
+    upload = dump_templates(library.items(), compact=True)
+    original_uploader = st.file_uploader
+    original_editor = st.data_editor
+
+    results = []
+    for name in interactions:
+        timings = []
+        for _ in range(repeat):
+            if name == "import_file":
+                st.file_uploader = lambda *args, **kwargs: FakeUpload(upload)
+            if name == "edit_task":
+                # AppTest cannot type into st.data_editor, so the table comes back with a cell changed
+                st.data_editor = lambda data, **kwargs: edit_first_task(original_editor(data, **kwargs))
+            try:
+                at = new_app(week, goals)
+                INTERACTIONS[name](at)
+                start = time.perf_counter()
+                at.run()
+                timings.append(time.perf_counter() - start)
+                if at.exception:
+                    raise RuntimeError(f"{name}: {at.exception[0].message}")
+            finally:
+                st.file_uploader = original_uploader
+                st.data_editor = original_editor
+        results.append({
+            **scenario,
+            "interaction": name,
+            "repeat": repeat,
+            "min_s": round(min(timings), 4),
+            "median_s": round(statistics.median(timings), 4),
+            "max_s": round(max(timings), 4),
+        })
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks-per-day", type=int_list, default=[5, 20])
+    parser.add_argument("--goals", type=int_list, default=[20, 2000])
+    parser.add_argument("--templates", type=int_list, default=[10, 500])
+    parser.add_argument("--focus-hours", type=int_list, default=[8])
+    parser.add_argument("--interactions", default=",".join(INTERACTIONS),
+                        help="comma-separated subset of: " + ", ".join(INTERACTIONS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=os.path.join(ROOT, "bench_results.jsonl"))
+    args = parser.parse_args(argv)
+
+    interactions = args.interactions.split(",")
+    unknown = set(interactions) - set(INTERACTIONS)
+    if unknown:
+        parser.error(f"unknown interactions: {', '.join(sorted(unknown))}")
+
+    run_info = {"timestamp": datetime.now().isoformat(timespec="seconds"), "revision": git_revision()}
+    with tempfile.TemporaryDirectory() as store_dir, open(args.output, "a") as out:
+        for tasks_per_day, goals, templates, focus_hours in itertools.product(
+            args.tasks_per_day, args.goals, args.templates, args.focus_hours
+        ):
+            scenario = {
+                "tasks_per_day": tasks_per_day,
+                "goals": goals,
+                "templates": templates,
+                "focus_hours": focus_hours,
+            }
+            for result in run_scenario(scenario, interactions, args.repeat, store_dir):
+                out.write(json.dumps({**run_info, **result}) + "\n")
+                out.flush()
+                print("{interaction:>14}  tasks/day={tasks_per_day:<4} goals={goals:<6} templates={templates:<6} "
+                      "median={median_s:.3f}s".format(**result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""Headless core of the Focus Work Planner.
+
+Importing this package pulls in only the standard library; Streamlit lives in
+``weekly_schedule.py`` and matplotlib is loaded by ``planner.render`` on first use.
+"""
+from .core import (
+    COPY_ADD,
+    COPY_MODES,
+    COPY_REPLACE,
+    DAYS,
+    FOCUS_ADD,
+    FOCUS_AUTO,
+    FOCUS_KEEP,
+    FOCUS_MODES,
+    MAX_TASK_HOURS,
+    SCHEMA_VERSION,
+    WEEKDAYS,
+    DayPlan,
+    Task,
+    Template,
+    Week,
+    dump_templates,
+    parse_templates,
+    schedule_digest,
+    tasks_from_rows,
+)
+from .goals import COLOR_PALETTE, GoalIndex, assign_goal_color, normalize_goal
@@ -0,0 +1,112 @@
+"""NumPy-backed representation of weeks for vectorized hour accounting and batched rendering"""
+import numpy as np
+
+from .core import DAYS
+
+
+class WeekArrays:
+    """Tasks of a week as flat arrays, grouped by day through a CSR-style offset index.
+
+    Tasks of day ``d`` occupy ``day_offsets[d]:day_offsets[d + 1]`` in every
+    per-task array; ``color_index`` points into ``colors``, the distinct hex
+    colours of the week in first-seen order.
+    """
+    __slots__ = ("durations", "day_index", "day_offsets", "color_index", "colors", "names", "focus_hours")
+
+    def __init__(self, durations, day_index, day_offsets, color_index, colors, names, focus_hours):
+        self.durations = durations
+        self.day_index = day_index
+        self.day_offsets = day_offsets
+        self.color_index = color_index
+        self.colors = colors
+        self.names = names
+        self.focus_hours = focus_hours
+
+    @classmethod
+    def from_week(cls, week):
+        durations, day_index, color_index, names = [], [], [], []
+        colors = {}
+        counts = []
+        for d, day in enumerate(DAYS):
+            tasks = week[day].tasks
+            counts.append(len(tasks))
+            for duration, name, color in tasks:
+                durations.append(duration)
+                day_index.append(d)
+                color_index.append(colors.setdefault(color, len(colors)))
+                names.append(name)
+        return cls(
+            durations=np.asarray(durations, dtype=np.int64),
+            day_index=np.asarray(day_index, dtype=np.int64),
+            day_offsets=np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+            color_index=np.asarray(color_index, dtype=np.int64),
+            colors=list(colors),
+            names=names,
+            focus_hours=np.asarray([week[day].focus_hours for day in DAYS], dtype=np.int64),
+        )
+
+    def __len__(self):
+        return len(self.durations)
+
+    @property
+    def task_counts(self):
+        return np.diff(self.day_offsets)
+
+    def starts(self):
+        """Start hour of every task, stacking tasks from 0 within each day"""
+        ends = np.cumsum(self.durations)
+        day_base = np.concatenate(([0], ends))[self.day_offsets[:-1]]
+        return ends - self.durations - np.repeat(day_base, self.task_counts)
+
+    def used_hours(self):
+        return np.bincount(self.day_index, weights=self.durations, minlength=len(DAYS)).astype(np.int64)
+
+    def remaining_hours(self):
+        return self.focus_hours - self.used_hours()
+
+    def overbooked(self):
+        """Per-day flag: tasks exceed the day's focus hours"""
+        return self.used_hours() > self.focus_hours
+
+    def task_overbooked(self):
+        """Per-task flag: the task sits on an overbooked day"""
+        return self.overbooked()[self.day_index]
+
+    @property
+    def total_tasks(self):
+        return len(self.durations)
+
+    @property
+    def total_focus_hours(self):
+        return int(self.focus_hours.sum())
+
+    @property
+    def total_used_hours(self):
+        return int(self.durations.sum())
+
+
+def summarize_weeks(weeks):
+    """Per-day accounting for many weeks at once.
+
+    Returns arrays of shape (len(weeks), 7) for focus, used and remaining hours
+    and overbooked flags, plus per-week task counts, from a single concatenation.
+    """
+    arrays = [WeekArrays.from_week(week) for week in weeks]
+    n_days = len(DAYS)
+    if not arrays:
+        empty = np.zeros((0, n_days), dtype=np.int64)
+        return {"focus_hours": empty, "used_hours": empty, "remaining_hours": empty,
+                "overbooked": empty.astype(bool), "total_tasks": np.zeros(0, dtype=np.int64)}
+
+    focus = np.stack([a.focus_hours for a in arrays])
+    durations = np.concatenate([a.durations for a in arrays])
+    week_day = np.concatenate([a.day_index + i * n_days for i, a in enumerate(arrays)])
+    used = np.bincount(week_day, weights=durations, minlength=len(arrays) * n_days)
+    used = used.astype(np.int64).reshape(len(arrays), n_days)
+    return {
+        "focus_hours": focus,
+        "used_hours": used,
+        "remaining_hours": focus - used,
+        "overbooked": used > focus,
+        "total_tasks": np.array([len(a) for a in arrays], dtype=np.int64),
+    }
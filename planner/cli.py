@@ -0,0 +1,163 @@
+"""Render saved templates to images from the command line, in parallel.
+
+    python -m planner.cli focus_templates.json -o renders/ --format png,svg
+
+Sources may be template export files (plain or gzip JSON) or directories of
+them. Each template is written to ``<output>/<source name>/<template slug>.<format>``
+and a ``summary.json`` with per-image timings is written next to them. Sources
+sharing a name (``a.json`` and ``a.json.gz``, or two ``templates.json`` in
+different folders) get a suffix derived from their path, as templates do.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .core import Template
+from .importer import load_templates
+
+FORMATS = ("png", "svg", "pdf")
+SOURCE_SUFFIXES = (".json", ".json.gz")
+
+
+def _init_worker():
+    # Workers never open a window; Agg is the non-interactive raster backend
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+    from .render import warm_up
+
+    # Each worker loads fonts once, before its first job
+    warm_up()
+
+
+def render_job(template_data, path, fmt, dpi):
+    """Render one template to path in a worker; returns (path, seconds)"""
+    from .render import render_export
+
+    start = time.perf_counter()
+    week = Template.from_dict(template_data).to_week()
+    data = render_export(week, week.max_hours, fmt=fmt, dpi=dpi)
+    with open(path, "wb") as out:
+        out.write(data)
+    return path, time.perf_counter() - start
+
+
+def slugify(name):
+    slug = re.sub(r"[^\w\-]+", "-", name.strip().lower()).strip("-")
+    return slug or "template"
+
+
+def source_files(paths):
+    """Expand directories into the template export files they contain, in sorted order"""
+    for path in paths:
+        if os.path.isdir(path):
+            for entry in sorted(os.listdir(path)):
+                if entry.endswith(SOURCE_SUFFIXES):
+                    yield os.path.join(path, entry)
+        else:
+            yield path
+
+
+def source_stem(path):
+    name = os.path.basename(path)
+    for suffix in SOURCE_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return os.path.splitext(name)[0]
+
+
+def unique_slug(slug, key, used):
+    """slug, or slug with a hash of key appended when it is already in used; adds the result to used"""
+    if slug in used:
+        slug = f"{slug}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]}"
+    used.add(slug)
+    return slug
+
+
+def plan_jobs(paths, output, formats, dpi):
+    """Yield (template data, output path, format, dpi) for every template, with stable file names"""
+    seen = set()
+    source_slugs = set()
+    for path in source_files(paths):
+        # A file named twice (directly and through its folder) is rendered once
+        real = os.path.realpath(path)
+        if real in seen:
+            continue
+        seen.add(real)
+
+        with open(path, "rb") as fp:
+            templates = load_templates(fp, os.path.getsize(path))
+        source_slug = unique_slug(slugify(source_stem(path)), os.path.normpath(path), source_slugs)
+        target_dir = os.path.join(output, source_slug)
+        os.makedirs(target_dir, exist_ok=True)
+
+        used = set()
+        for name in sorted(templates):
+            slug = unique_slug(slugify(name), name, used)
+            for fmt in formats:
+                yield templates[name].to_dict(), os.path.join(target_dir, f"{slug}.{fmt}"), fmt, dpi
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render saved weekly templates to images.")
+    parser.add_argument("sources", nargs="+", help="template export files or directories of them")
+    parser.add_argument("-o", "--output", default="renders", help="output directory (default: renders)")
+    parser.add_argument("-f", "--format", default="png",
+                        help="comma-separated output formats: " + ", ".join(FORMATS))
+    parser.add_argument("--dpi", type=int, default=300, help="resolution of raster output (default: 300)")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    formats = [fmt.strip() for fmt in args.format.split(",") if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in FORMATS]
+    if unknown:
+        parser.error(f"unsupported format: {', '.join(unknown)}")
+
+    try:
+        jobs = list(plan_jobs(args.sources, args.output, formats, args.dpi))
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    timings = {}
+    failures = {}
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(render_job, *job): job[1] for job in jobs}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                timings[path] = future.result()[1]
+            except Exception as e:
+                failures[path] = str(e)
+                print(f"failed: {path}: {e}", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+
+    summary = {
+        "images": len(timings),
+        "failed": len(failures),
+        "wall_s": round(elapsed, 3),
+        "render_s_total": round(sum(timings.values()), 3),
+        "render_s_max": round(max(timings.values(), default=0.0), 3),
+        "renders": {os.path.relpath(path, args.output): round(seconds, 3) for path, seconds in sorted(timings.items())},
+        "failures": {os.path.relpath(path, args.output): error for path, error in sorted(failures.items())},
+    }
+    os.makedirs(args.output, exist_ok=True)
+    with open(os.path.join(args.output, "summary.json"), "w") as out:
+        json.dump(summary, out, indent=2)
+
+    mean = summary["render_s_total"] / len(timings) if timings else 0.0
+    print(f"Rendered {len(timings)} images in {elapsed:.2f}s "
+          f"(mean {mean:.2f}s, max {summary['render_s_max']:.2f}s per image, {len(failures)} failed)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Colour derivations for charts: vibrant bar fills and readable label text, computed once per colour"""
+import re
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+_HEX = re.compile(r"#?([0-9a-fA-F]{3}|[0-9a-fA-F]{6}|[0-9a-fA-F]{8})")
+
+WHITE_TEXT = "#FFFFFF"
+BLACK_TEXT = "#000000"
+
+
+def hex_to_rgb(color):
+    """(r, g, b) floats in [0, 1] for a "#rgb", "#rrggbb" or "#rrggbbaa" string"""
+    match = _HEX.fullmatch(color)
+    if match is None:
+        # Named and other colour specs are rare; matplotlib knows them all
+        import matplotlib.colors as mcolors
+
+        return mcolors.to_rgb(color)
+    digits = match.group(1)
+    if len(digits) == 3:
+        digits = "".join(digit * 2 for digit in digits)
+    return tuple(int(digits[i:i + 2], 16) / 255 for i in (0, 2, 4))
+
+
+def rgb_to_hsv(rgb):
+    """Vectorized RGB -> HSV over the last axis, with the same arithmetic as matplotlib.colors"""
+    rgb = np.asarray(rgb, dtype=float)
+    hsv = np.zeros_like(rgb)
+    value = rgb.max(-1)
+    delta = np.ptp(rgb, -1)
+    saturation = np.zeros_like(delta)
+    lit = value > 0
+    saturation[lit] = delta[lit] / value[lit]
+
+    chroma = delta > 0
+    red = (rgb[..., 0] == value) & chroma
+    hsv[red, 0] = (rgb[red, 1] - rgb[red, 2]) / delta[red]
+    green = (rgb[..., 1] == value) & chroma
+    hsv[green, 0] = 2. + (rgb[green, 2] - rgb[green, 0]) / delta[green]
+    blue = (rgb[..., 2] == value) & chroma
+    hsv[blue, 0] = 4. + (rgb[blue, 0] - rgb[blue, 1]) / delta[blue]
+
+    hsv[..., 0] = (hsv[..., 0] / 6.0) % 1.0
+    hsv[..., 1] = saturation
+    hsv[..., 2] = value
+    return hsv
+
+
+def hsv_to_rgb(hsv):
+    """Vectorized HSV -> RGB over the last axis, with the same arithmetic as matplotlib.colors"""
+    hsv = np.asarray(hsv, dtype=float)
+    h, s, v = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+    sector = (h * 6.0).astype(int)
+    f = (h * 6.0) - sector
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+
+    sector = sector % 6
+    r = np.select([sector == k for k in range(6)], [v, q, p, p, t, v])
+    g = np.select([sector == k for k in range(6)], [t, v, v, q, p, p])
+    b = np.select([sector == k for k in range(6)], [p, p, t, v, v, q])
+    grey = s == 0
+    r, g, b = np.where(grey, v, r), np.where(grey, v, g), np.where(grey, v, b)
+    return np.stack([r, g, b], axis=-1)
+
+
+class ColorTable:
+    """Vibrant fill and label text colour of every hex colour seen so far, for one pair of boosts.
+
+    A lookup derives all unseen colours of a week in one vectorized pass and
+    appends them as rows; tables are shared by every session in the process.
+    """
+
+    def __init__(self, saturation_boost, brightness_boost):
+        self.saturation_boost = saturation_boost
+        self.brightness_boost = brightness_boost
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._fill = np.empty((0, 3))
+        self._fill_hex = []
+        self._dark = np.empty(0, dtype=bool)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _rows_for(self, colors):
+        """Row of each colour, deriving the missing ones together (call with the lock held)"""
+        missing = [color for color in dict.fromkeys(colors) if color not in self._rows]
+        if missing:
+            rgb = np.array([hex_to_rgb(color) for color in missing])
+            hsv = rgb_to_hsv(rgb)
+            hsv[:, 1] = np.minimum(1.0, hsv[:, 1] * self.saturation_boost)
+            hsv[:, 2] = np.minimum(1.0, hsv[:, 2] * self.brightness_boost)
+            fill = hsv_to_rgb(hsv)
+
+            first = len(self._rows)
+            self._rows.update((color, first + offset) for offset, color in enumerate(missing))
+            self._fill = np.concatenate([self._fill, fill])
+            self._fill_hex = self._fill_hex + [
+                "#" + "".join(f"{round(channel * 255):02X}" for channel in row) for row in fill.tolist()
+            ]
+            self._dark = np.concatenate([self._dark, rgb.mean(axis=1) < 0.5])
+        return np.array([self._rows[color] for color in colors], dtype=np.int64)
+
+    def lookup(self, colors):
+        """(fill RGB array of shape (n, 3), dark-colour flags of shape (n,)) for a sequence of hex colours"""
+        with self._lock:
+            rows = self._rows_for(colors)
+            return self._fill[rows], self._dark[rows]
+
+    def lookup_hex(self, colors):
+        """(fill hex strings, label text hex strings) for a sequence of hex colours"""
+        with self._lock:
+            rows = self._rows_for(colors)
+            fill_hex, dark = self._fill_hex, self._dark
+        return [fill_hex[row] for row in rows], [WHITE_TEXT if dark[row] else BLACK_TEXT for row in rows]
+
+
+@lru_cache(maxsize=None)
+def _table(saturation_boost, brightness_boost):
+    return ColorTable(saturation_boost, brightness_boost)
+
+
+def color_table(style):
+    """The process-wide ColorTable for a chart style's saturation and brightness boosts"""
+    return _table(style["saturation_boost"], style["brightness_boost"])
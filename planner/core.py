@@ -0,0 +1,420 @@
+"""Schedule model and operations, usable without Streamlit or matplotlib"""
+import gzip
+import hashlib
+import json
+import math
+import numbers
+import re
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import NamedTuple
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+WEEKDAYS = DAYS[:5]
+
+# Version of the exported templates file format; files without one are version 1.
+# Version 3 lets an entry hold only its differences from an earlier entry ("base").
+SCHEMA_VERSION = 3
+
+# Templates compared when looking for the base that gives the smallest delta
+DELTA_CANDIDATES = 8
+
+# Chart width used while no day has focus hours
+DEFAULT_MAX_HOURS = 12
+
+# Copy modes offered by the advanced copy options
+COPY_REPLACE = "Replace all tasks"
+COPY_ADD = "Add to existing tasks"
+COPY_MODES = [COPY_REPLACE, COPY_ADD]
+
+FOCUS_AUTO = "Auto-calculate from copied tasks"
+FOCUS_KEEP = "Keep existing focus hours"
+FOCUS_ADD = "Add to existing focus hours"
+FOCUS_MODES = [FOCUS_AUTO, FOCUS_KEEP, FOCUS_ADD]
+
+# Colours as the colour picker produces them
+HEX_COLOR = re.compile(r"#[0-9a-fA-F]{6}")
+
+# Longest task the editors accept, in hours
+MAX_TASK_HOURS = 24
+
+
+class Task(NamedTuple):
+    """A block of focus work; unpacks as (duration, name, color)"""
+    duration: int
+    name: str
+    color: str
+
+
+def _blank(value):
+    return value is None or (isinstance(value, float) and math.isnan(value)) or value == ""
+
+
+def tasks_from_rows(rows):
+    """Validate rows edited in a table (task, hours, color, order) into Tasks sorted by order.
+
+    Returns (tasks, errors); tasks are only meaningful when errors is empty.
+    Rows left completely blank are skipped, and rows without an order keep
+    their position after the ordered ones.
+    """
+    tasks, errors = [], []
+    for position, row in enumerate(rows, 1):
+        name, hours, color, order = (row.get(key) for key in ("task", "hours", "color", "order"))
+        if all(_blank(value) for value in (name, hours, color)):
+            continue
+        name = "" if _blank(name) else str(name).strip()
+        row_errors = len(errors)
+        if not name:
+            errors.append(f"Row {position}: task name cannot be empty.")
+        if not isinstance(hours, numbers.Real) or _blank(hours) or hours != int(hours) \
+                or not 1 <= hours <= MAX_TASK_HOURS:
+            errors.append(f"Row {position}: hours must be a whole number from 1 to {MAX_TASK_HOURS}.")
+        if _blank(color) or not HEX_COLOR.fullmatch(str(color)):
+            errors.append(f"Row {position}: color must look like #4A90E2.")
+        if len(errors) > row_errors:
+            continue
+        sort_key = (math.inf, position) if _blank(order) else (float(order), position)
+        tasks.append((sort_key, Task(int(hours), name, str(color))))
+    tasks.sort(key=lambda item: item[0])
+    return [task for _, task in tasks], errors
+
+
+@dataclass(slots=True)
+class DayPlan:
+    """Focus hours allocated to a day and the tasks filling them; change it through Week"""
+    focus_hours: int = 0
+    tasks: list = field(default_factory=list)
+    used_hours: int = field(init=False, default=0)
+
+    def __post_init__(self):
+        self.used_hours = sum(task.duration for task in self.tasks)
+
+    @property
+    def remaining_hours(self):
+        return self.focus_hours - self.used_hours
+
+    @property
+    def overbooked(self):
+        return self.used_hours > self.focus_hours
+
+
+class Week:
+    """Seven day plans plus the operations the planner performs on them.
+
+    The weekly aggregates are kept up to date by the mutation methods, so
+    reading them never rescans the days; change plans only through these methods.
+    """
+    __slots__ = ("days", "total_tasks", "total_focus_hours", "days_with_tasks",
+                 "days_with_focus_hours", "_focus_counts", "_max_focus")
+
+    def __init__(self, days=None):
+        self._reset(days if days is not None else {day: DayPlan() for day in DAYS})
+
+    def _reset(self, days):
+        self.days = days
+        self.total_tasks = sum(len(plan.tasks) for plan in days.values())
+        self.total_focus_hours = sum(plan.focus_hours for plan in days.values())
+        self.days_with_tasks = sum(1 for plan in days.values() if plan.tasks)
+        self.days_with_focus_hours = sum(1 for plan in days.values() if plan.focus_hours > 0)
+        self._focus_counts = Counter(plan.focus_hours for plan in days.values())
+        self._max_focus = max(self._focus_counts, default=0)
+
+    @classmethod
+    def from_dict(cls, tasks, focus_hours):
+        """Build a week from the day -> tasks / day -> hours mappings used in templates"""
+        return cls({
+            day: DayPlan(
+                focus_hours=focus_hours.get(day, 0),
+                tasks=[Task(*task) for task in tasks.get(day, [])]
+            )
+            for day in DAYS
+        })
+
+    def to_dict(self):
+        """Return the week as day -> tasks and day -> hours mappings"""
+        return {
+            "tasks": {day: list(plan.tasks) for day, plan in self.days.items()},
+            "focus_hours": {day: plan.focus_hours for day, plan in self.days.items()},
+        }
+
+    def copy(self):
+        return Week({day: DayPlan(plan.focus_hours, list(plan.tasks)) for day, plan in self.days.items()})
+
+    def __getitem__(self, day):
+        return self.days[day]
+
+    def __iter__(self):
+        return iter(self.days.items())
+
+    # --- Aggregates ---
+
+    @property
+    def max_hours(self):
+        """Chart width: the largest daily allocation, or 12 when nothing is allocated"""
+        return self._max_focus or DEFAULT_MAX_HOURS
+
+    def has_data(self):
+        return self.days_with_tasks > 0 or self.days_with_focus_hours > 0
+
+    def _tasks_changed(self, plan, tasks):
+        """Swap in a day's task list, adjusting the task aggregates by the difference"""
+        self.total_tasks += len(tasks) - len(plan.tasks)
+        self.days_with_tasks += bool(tasks) - bool(plan.tasks)
+        plan.tasks = tasks
+
+    def _focus_changed(self, plan, hours):
+        """Set a day's focus hours, adjusting the focus aggregates by the difference"""
+        old = plan.focus_hours
+        if hours == old:
+            return
+        self.total_focus_hours += hours - old
+        self.days_with_focus_hours += (hours > 0) - (old > 0)
+        plan.focus_hours = hours
+
+        counts = self._focus_counts
+        counts[hours] += 1
+        counts[old] -= 1
+        if not counts[old]:
+            del counts[old]
+        if hours > self._max_focus:
+            self._max_focus = hours
+        elif old == self._max_focus and old not in counts:
+            # At most seven distinct allocations, so this stays constant-time
+            self._max_focus = max(counts)
+
+    # --- Mutations ---
+
+    def add_task(self, day, task):
+        task = Task(*task)
+        plan = self.days[day]
+        plan.tasks.append(task)
+        plan.used_hours += task.duration
+        self.total_tasks += 1
+        self.days_with_tasks += len(plan.tasks) == 1
+
+    def update_task(self, day, index, task):
+        task = Task(*task)
+        plan = self.days[day]
+        plan.used_hours += task.duration - plan.tasks[index].duration
+        plan.tasks[index] = task
+
+    def delete_task(self, day, index):
+        plan = self.days[day]
+        task = plan.tasks.pop(index)
+        plan.used_hours -= task.duration
+        self.total_tasks -= 1
+        self.days_with_tasks -= not plan.tasks
+        return task
+
+    def set_focus_hours(self, day, hours):
+        self._focus_changed(self.days[day], hours)
+
+    def copy_tasks(self, tasks, targets, copy_mode=COPY_REPLACE, focus_mode=FOCUS_AUTO):
+        """Copy tasks onto each target day, handling tasks and focus hours per the given modes"""
+        tasks = [Task(*task) for task in tasks]
+        copied_hours = sum(task.duration for task in tasks)
+        for target_day in targets:
+            plan = self.days[target_day]
+            if copy_mode == COPY_REPLACE:
+                self._tasks_changed(plan, list(tasks))
+                plan.used_hours = copied_hours
+            else:
+                self._tasks_changed(plan, plan.tasks + tasks)
+                plan.used_hours += copied_hours
+
+            if focus_mode == FOCUS_AUTO:
+                if copy_mode == COPY_REPLACE:
+                    self._focus_changed(plan, copied_hours)
+                else:
+                    self._focus_changed(plan, plan.focus_hours + copied_hours)
+            elif focus_mode == FOCUS_ADD:
+                self._focus_changed(plan, plan.focus_hours + copied_hours)
+            # FOCUS_KEEP leaves focus hours untouched
+
+    def replace_day(self, day, focus_hours, tasks):
+        """Set a day's focus hours and tasks outright, e.g. when restoring a snapshot"""
+        plan = self.days[day]
+        tasks = [Task(*task) for task in tasks]
+        self._tasks_changed(plan, tasks)
+        plan.used_hours = sum(task.duration for task in tasks)
+        self._focus_changed(plan, focus_hours)
+
+    def load(self, other):
+        """Take over another week's plans in place, so references to this week stay valid"""
+        self._reset(other.days)
+
+    def clear(self):
+        self._reset({day: DayPlan() for day in DAYS})
+
+
+@dataclass(slots=True)
+class Template:
+    """A saved week together with its goal colours"""
+    tasks: dict
+    focus_hours: dict
+    goal_colors: dict
+    created_at: str
+    total_tasks: int = 0
+    total_focus_hours: int = 0
+
+    @classmethod
+    def from_week(cls, week, goal_colors, created_at=None):
+        data = week.to_dict()
+        return cls(
+            tasks=data["tasks"],
+            focus_hours=data["focus_hours"],
+            goal_colors=dict(goal_colors),
+            created_at=created_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            total_tasks=week.total_tasks,
+            total_focus_hours=week.total_focus_hours,
+        )
+
+    @classmethod
+    def from_dict(cls, data, bases=None):
+        """Validate and load a template from its exported JSON form.
+
+        An entry with a "base" holds only its differences from that template,
+        which is looked up by name in bases.
+        """
+        if not isinstance(data, dict) or not isinstance(data.get("tasks"), dict):
+            raise ValueError("template must contain a 'tasks' mapping")
+        if "base" in data:
+            base = (bases or {}).get(data["base"])
+            if base is None:
+                raise ValueError(f"unknown base template: {data['base']!r}")
+            return base.patch(data, data.get("created_at", ""))
+        week = Week.from_dict(data["tasks"], data.get("focus_hours") or {})
+        return cls.from_week(week, data.get("goal_colors") or {}, data.get("created_at", ""))
+
+    def to_dict(self):
+        return {
+            "tasks": self.tasks,
+            "focus_hours": self.focus_hours,
+            "goal_colors": self.goal_colors,
+            "created_at": self.created_at,
+            "total_tasks": self.total_tasks,
+            "total_focus_hours": self.total_focus_hours,
+        }
+
+    def to_week(self):
+        """Materialize a fresh week, so later edits never touch the template"""
+        return Week.from_dict(self.tasks, self.focus_hours)
+
+    def diff(self, base):
+        """The tasks, focus hours and goal colours that turn base into this template"""
+        delta = {
+            "tasks": {day: self.tasks[day] for day in DAYS if self.tasks[day] != base.tasks[day]},
+            "focus_hours": {
+                day: self.focus_hours[day] for day in DAYS if self.focus_hours[day] != base.focus_hours[day]
+            },
+            "goal_colors": {
+                goal: color for goal, color in self.goal_colors.items() if base.goal_colors.get(goal) != color
+            },
+            "removed_goals": [goal for goal in base.goal_colors if goal not in self.goal_colors],
+        }
+        return {key: value for key, value in delta.items() if value or key == "tasks"}
+
+    def patch(self, delta, created_at):
+        """A new template with delta applied on top of this one.
+
+        Unchanged day lists are shared with this template rather than copied;
+        templates are never modified in place, and to_week copies them.
+        """
+        tasks = dict(self.tasks)
+        for day, day_tasks in delta["tasks"].items():
+            if day not in tasks:
+                raise ValueError(f"unknown day in template: {day!r}")
+            tasks[day] = [Task(*task) for task in day_tasks]
+        focus_hours = dict(self.focus_hours)
+        for day, hours in (delta.get("focus_hours") or {}).items():
+            if day not in focus_hours:
+                raise ValueError(f"unknown day in template: {day!r}")
+            focus_hours[day] = hours
+        goal_colors = dict(self.goal_colors)
+        goal_colors.update(delta.get("goal_colors") or {})
+        for goal in delta.get("removed_goals") or ():
+            goal_colors.pop(goal, None)
+        return Template(
+            tasks=tasks,
+            focus_hours=focus_hours,
+            goal_colors=goal_colors,
+            created_at=created_at,
+            total_tasks=sum(len(day_tasks) for day_tasks in tasks.values()),
+            total_focus_hours=sum(focus_hours.values()),
+        )
+
+    def content(self):
+        """tasks, focus_hours and goal_colors: the part of a template that deltas describe"""
+        return {"tasks": self.tasks, "focus_hours": self.focus_hours, "goal_colors": self.goal_colors}
+
+
+def smallest_delta(template, candidates):
+    """Pick the (name, Template) candidate that template differs least from.
+
+    Returns (base name, delta), or (None, None) when the template is smaller
+    stored in full than as a delta against any candidate.
+    """
+    best_name, best_delta = None, None
+    best_size = len(json.dumps(template.content(), separators=(",", ":")))
+    for name, candidate in candidates:
+        delta = template.diff(candidate)
+        size = len(json.dumps(delta, separators=(",", ":")))
+        if size < best_size:
+            best_name, best_delta, best_size = name, delta, size
+    return best_name, best_delta
+
+
+def check_schema_version(import_data):
+    """Reject exported files written by a newer, incompatible version of the app"""
+    version = import_data.get("schema_version", 1)
+    if not isinstance(version, int) or version > SCHEMA_VERSION:
+        raise ValueError(f"Unsupported template file schema version: {version}")
+
+
+def parse_templates(import_data):
+    """Return the name -> Template mapping from an exported templates file"""
+    if not isinstance(import_data, dict) or not isinstance(import_data.get("templates"), dict):
+        raise ValueError("Invalid template file format.")
+    check_schema_version(import_data)
+    templates = {}
+    for name, data in import_data["templates"].items():
+        templates[name] = Template.from_dict(data, templates)
+    return templates
+
+
+def dump_templates(items, compact=False, compress=False):
+    """Serialize (name, Template) pairs to an export file; compressed output is always compact.
+
+    Compact and compressed files store each template as a delta against one of
+    the few templates written just before it when that is smaller, so similar
+    templates cost only their differences.
+    """
+    entries = {}
+    recent = deque(maxlen=DELTA_CANDIDATES)
+    for name, template in items:
+        entry = template.to_dict()
+        if compact or compress:
+            base, delta = smallest_delta(template, recent)
+            if base is not None:
+                entry = {"base": base, **delta, "created_at": template.created_at,
+                         "total_tasks": template.total_tasks, "total_focus_hours": template.total_focus_hours}
+            recent.append((name, template))
+        entries[name] = entry
+    export_data = {
+        "schema_version": SCHEMA_VERSION,
+        "exported_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "templates": entries,
+    }
+    if compact or compress:
+        text = json.dumps(export_data, separators=(",", ":"))
+    else:
+        text = json.dumps(export_data, indent=2)
+    data = text.encode("utf-8")
+    return gzip.compress(data) if compress else data
+
+
+def schedule_digest(*parts):
+    """Canonical hash of the week state a rendered schedule depends on"""
+    payload = json.dumps(parts, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
@@ -0,0 +1,131 @@
+"""Goal colour palette and fuzzy matching of task names to existing goals"""
+import re
+from collections import Counter, defaultdict
+from itertools import islice
+
+# Curated color palette that looks good together; a tuple so every session can share it
+COLOR_PALETTE = (
+    "#4A90E2",  # Blue
+    "#7ED321",  # Green
+    "#F5A623",  # Orange
+    "#D0021B",  # Red
+    "#9013FE",  # Purple
+    "#50E3C2",  # Teal
+    "#B8E986",  # Light Green
+    "#FF6B6B",  # Coral
+    "#4ECDC4",  # Mint
+    "#45B7D1",  # Sky Blue
+    "#96CEB4",  # Sage
+    "#FFEAA7",  # Yellow
+    "#DDA0DD",  # Plum
+    "#87CEEB",  # Light Blue
+    "#F0A591"   # Peach
+)
+
+
+def normalize_goal(name):
+    """Lowercase a goal or task name and strip punctuation for fuzzy matching"""
+    return re.sub(r'[^\w\s]', '', name.lower().strip())
+
+
+def trigrams(text):
+    """Set of 3-character substrings of text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class GoalIndex:
+    """Incrementally maintained lookup structures for fuzzy goal matching.
+
+    A task matches the first goal (in insertion order) that shares at least 60%
+    of its words or where one normalized name contains the other.
+    """
+
+    def __init__(self):
+        self.source = None
+        self.goals = []              # goal names in insertion order
+        self.normalized = []         # normalized name per position (None if it has no words)
+        self.word_counts = []        # number of distinct words per position
+        self.positions = {}          # goal name -> position
+        self.by_word = defaultdict(set)
+        self.by_normalized = defaultdict(list)
+        self.by_trigram = defaultdict(set)
+        self.lengths = set()
+
+    def sync(self, goal_colors):
+        """Bring the index up to date with goal_colors, rebuilding only if it was replaced"""
+        if self.source is not goal_colors or len(goal_colors) < len(self.goals):
+            self.__init__()
+            self.source = goal_colors
+        for goal in islice(goal_colors, len(self.goals), None):
+            self.add(goal)
+
+    def add(self, goal):
+        """Index a single goal name"""
+        if goal in self.positions:
+            return
+        pos = len(self.goals)
+        clean = normalize_goal(goal)
+        words = set(clean.split())
+        self.goals.append(goal)
+        self.positions[goal] = pos
+        self.word_counts.append(len(words))
+        if not words:
+            self.normalized.append(None)
+            return
+
+        self.normalized.append(clean)
+        for word in words:
+            self.by_word[word].add(pos)
+        self.by_normalized[clean].append(pos)
+        self.lengths.add(len(clean))
+        for gram in trigrams(clean):
+            self.by_trigram[gram].add(pos)
+
+    def match(self, task_name):
+        """Return the first existing goal matching task_name, or None"""
+        clean = normalize_goal(task_name)
+        words = set(clean.split())
+        if not words:
+            return None
+        candidates = set()
+
+        # Word overlap rule: count shared words per goal via the inverted index
+        overlap = Counter()
+        for word in words:
+            overlap.update(self.by_word.get(word, ()))
+        for pos, shared in overlap.items():
+            if shared / min(len(words), self.word_counts[pos]) >= 0.6:
+                candidates.add(pos)
+
+        # Existing goal contained in the task name: look up each substring of a known length
+        for length in self.lengths:
+            for start in range(len(clean) - length + 1):
+                candidates.update(self.by_normalized.get(clean[start:start + length], ()))
+
+        # Task name contained in an existing goal: intersect trigram postings, then verify
+        grams = trigrams(clean)
+        if grams:
+            postings = sorted((self.by_trigram.get(gram, set()) for gram in grams), key=len)
+            possible = set.intersection(*postings)
+        else:
+            possible = range(len(self.goals))
+        candidates.update(
+            pos for pos in possible
+            if self.normalized[pos] is not None and clean in self.normalized[pos]
+        )
+
+        return self.goals[min(candidates)] if candidates else None
+
+
+def assign_goal_color(goal_colors, index, task_name, palette=COLOR_PALETTE):
+    """Get color for a goal using fuzzy matching, registering a new goal if nothing matches"""
+    index.sync(goal_colors)
+    matched_goal = index.match(task_name)
+    if matched_goal is not None:
+        return goal_colors[matched_goal]
+
+    # No match found, assign new color
+    new_color = palette[len(goal_colors) % len(palette)]
+    goal_colors[task_name] = new_color
+    index.add(task_name)
+    return new_color
@@ -0,0 +1,159 @@
+"""Bounded undo/redo history of week and template library changes"""
+from collections import deque
+from contextlib import contextmanager
+from typing import NamedTuple
+
+# Actions kept for undo unless the caller asks for another depth
+DEFAULT_DEPTH = 50
+
+
+class DaySnapshot(NamedTuple):
+    """Immutable state of one day; the tasks are shared with the week, not copied"""
+    focus_hours: int
+    tasks: tuple
+
+
+class Change(NamedTuple):
+    """One recorded action: (before, after) states of only the days and templates it touched.
+
+    Template states are the store's raw rows, None for a template that did not
+    exist; goal_colors maps each goal the action changed to its (before, after)
+    colours, None where the goal did not exist. recurrences is the (before,
+    after) pair of repeat rule tuples, or None when the rules were left alone.
+    """
+    label: str
+    days: dict
+    templates: dict
+    goal_colors: dict = None
+    recurrences: tuple = None
+
+
+def snapshot_day(plan):
+    return DaySnapshot(plan.focus_hours, tuple(plan.tasks))
+
+
+class History:
+    """Undo and redo stacks of Changes, keeping at most depth actions.
+
+    Snapshots hold tuples of the week's (immutable) tasks and the store's
+    (immutable) rows, so successive snapshots share everything they did not
+    change and each action costs time and memory in proportion to what it touched.
+    """
+
+    def __init__(self, depth=DEFAULT_DEPTH):
+        self._undo = deque(maxlen=depth)
+        self._redo = []
+
+    @property
+    def depth(self):
+        return self._undo.maxlen
+
+    @depth.setter
+    def depth(self, depth):
+        self._undo = deque(self._undo, maxlen=depth)
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def undo_label(self):
+        return self._undo[-1].label if self._undo else None
+
+    def redo_label(self):
+        return self._redo[-1].label if self._redo else None
+
+    @contextmanager
+    def record(self, label, week, days=(), store=None, names=(), goal_colors=None, goals=None, recurrences=None):
+        """Record the action run inside the block, given the days, template names and goal colours it may change.
+
+        goal_colors is a callable returning the current mapping, since actions may
+        replace the mapping rather than edit it. goals names the goals an action
+        editing the mapping in place may set; only those are compared and kept.
+        recurrences is a callable returning the current repeat rules, for actions
+        that may change them. Nothing is recorded if the block raises or changes nothing.
+        """
+        days = list(days)
+        names = set(names)
+        before_days = {day: snapshot_day(week[day]) for day in days}
+        before_templates = store.snapshot(names) if names else {}
+        if goal_colors is not None:
+            before_mapping = goal_colors()
+            goals = set(goals) if goals is not None else None
+            before_goals = dict(before_mapping) if goals is None else {goal: before_mapping.get(goal) for goal in goals}
+        # Rules are immutable, so the tuples share them with the caller's list
+        before_rules = tuple(recurrences()) if recurrences is not None else None
+        yield
+
+        changed_days = {}
+        for day in days:
+            after = snapshot_day(week[day])
+            if after != before_days[day]:
+                changed_days[day] = (before_days[day], after)
+        changed_templates = {}
+        if names:
+            for name, after in store.snapshot(names).items():
+                if after != before_templates[name]:
+                    changed_templates[name] = (before_templates[name], after)
+        changed_goals = None
+        if goal_colors is not None:
+            after_mapping = goal_colors()
+            if after_mapping is not before_mapping or goals is None:
+                # A replaced mapping may differ anywhere
+                goals = before_goals.keys() | after_mapping.keys()
+            changed_goals = {
+                goal: (before_goals.get(goal), after_mapping.get(goal)) for goal in goals
+                if before_goals.get(goal) != after_mapping.get(goal)
+            } or None
+
+        changed_rules = None
+        if recurrences is not None and tuple(recurrences()) != before_rules:
+            changed_rules = (before_rules, tuple(recurrences()))
+
+        if changed_days or changed_templates or changed_goals or changed_rules:
+            self._undo.append(Change(label, changed_days, changed_templates, changed_goals, changed_rules))
+            self._redo.clear()
+
+    def undo(self, week, store=None):
+        """Revert the latest action and return its Change; the caller restores goal colours and repeat rules"""
+        change = self._undo.pop()
+        _apply(change, week, store, 0)
+        self._redo.append(change)
+        return change
+
+    def redo(self, week, store=None):
+        """Reapply the latest undone action and return its Change"""
+        change = self._redo.pop()
+        _apply(change, week, store, 1)
+        self._undo.append(change)
+        return change
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+
+
+def _apply(change, week, store, side):
+    """Put every touched day and template back to its before (0) or after (1) state"""
+    for day, states in change.days.items():
+        state = states[side]
+        week.replace_day(day, state.focus_hours, state.tasks)
+    if change.templates:
+        store.restore({name: states[side] for name, states in change.templates.items()})
+
+
+def restore_goals(goal_colors, changes, side):
+    """Put the goals in a Change's goal_colors back to their before (0) or after (1) colours.
+
+    Edits goal_colors in place and returns it, or a copy when goals were removed,
+    so indexes that rely on goals only ever being appended rebuild.
+    """
+    removed = False
+    for goal, states in changes.items():
+        if states[side] is None:
+            goal_colors.pop(goal, None)
+            removed = True
+        else:
+            goal_colors[goal] = states[side]
+    return dict(goal_colors) if removed else goal_colors
@@ -0,0 +1,87 @@
+"""Multi-week plans keyed by date; only the weeks being looked at are materialized"""
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import date, timedelta
+
+from .core import Week
+from .recurrence import week_start
+
+# Materialized weeks kept around for windowed views
+LIVE_WEEKS = 8
+
+
+class Horizon:
+    """Weeks of a multi-week plan keyed by their Monday.
+
+    Weeks are kept as compact JSON and turned back into Week objects only when
+    a window that includes them is viewed; a few recently viewed ones stay
+    materialized. Weeks never touched take no space at all.
+    """
+
+    def __init__(self, live_weeks=LIVE_WEEKS):
+        self._serialized = {}
+        self._digests = {}
+        self._live = OrderedDict()
+        self._live_weeks = live_weeks
+
+    def __len__(self):
+        return len(self._serialized)
+
+    def __contains__(self, monday):
+        return monday in self._serialized
+
+    def mondays(self):
+        return sorted(self._serialized)
+
+    def put(self, monday, week):
+        """Store a copy of week under monday; an empty week removes the entry"""
+        monday = week_start(monday)
+        self._live.pop(monday, None)
+        self._digests.pop(monday, None)
+        if week.has_data():
+            self._serialized[monday] = json.dumps(week.to_dict(), separators=(",", ":"))
+        else:
+            self._serialized.pop(monday, None)
+
+    def load(self, monday):
+        """A new Week for monday that the caller may edit; empty if nothing is stored"""
+        data = self._serialized.get(week_start(monday))
+        if data is None:
+            return Week()
+        data = json.loads(data)
+        return Week.from_dict(data["tasks"], data["focus_hours"])
+
+    def peek(self, monday):
+        """The week for monday for reading only, materialized at most once while it stays live"""
+        monday = week_start(monday)
+        if monday in self._live:
+            self._live.move_to_end(monday)
+            return self._live[monday]
+        week = self.load(monday)
+        self._live[monday] = week
+        while len(self._live) > self._live_weeks:
+            self._live.popitem(last=False)
+        return week
+
+    def digest(self, monday):
+        """Hash of the stored week, for caching renders without materializing it"""
+        monday = week_start(monday)
+        if monday not in self._digests:
+            data = self._serialized.get(monday, "")
+            self._digests[monday] = hashlib.sha1(data.encode("utf-8")).hexdigest()
+        return self._digests[monday]
+
+    def window(self, start, count):
+        """Mondays of the count weeks from the week containing start"""
+        first = week_start(start)
+        return [first + timedelta(weeks=offset) for offset in range(count)]
+
+    def to_dict(self):
+        return {monday.isoformat(): data for monday, data in self._serialized.items()}
+
+    @classmethod
+    def from_dict(cls, data, live_weeks=LIVE_WEEKS):
+        horizon = cls(live_weeks)
+        horizon._serialized = {date.fromisoformat(monday): text for monday, text in data.items()}
+        return horizon
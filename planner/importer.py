@@ -0,0 +1,129 @@
+"""Parsing of exported template files, streaming for large or compressed uploads"""
+import gzip
+import io
+import json
+
+from .core import Template, check_schema_version, parse_templates
+
+# Uploads larger than this are parsed template by template instead of in one json.load
+STREAMING_IMPORT_BYTES = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+_WHITESPACE = " \t\n\r"
+
+
+class _Reader:
+    """Character buffer over a text stream that refills on demand"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        chunk = self.stream.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                raise ValueError("Unexpected end of file")
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos}")
+        self.pos += 1
+
+    def value(self, decoder=json.JSONDecoder()):
+        """Decode the next JSON value, reading more input until it is complete"""
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A value ending exactly at the buffer edge (e.g. a number) may continue in the next chunk
+            if end == len(self.buf) and not self.eof and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_template_items(stream, header=None):
+    """Yield (name, raw template dict) pairs from the "templates" object of an export file.
+
+    Only one template is held in memory at a time, together with one read chunk.
+    Other top-level keys (schema_version, exported_at) are stored in header.
+    """
+    if header is None:
+        header = {}
+    reader = _Reader(stream)
+    found = False
+    reader.expect("{")
+    if reader.peek() == "}":
+        reader.pos += 1
+    else:
+        while True:
+            key = reader.value()
+            reader.expect(":")
+            if key == "templates":
+                found = True
+                reader.expect("{")
+                if reader.peek() == "}":
+                    reader.pos += 1
+                else:
+                    while True:
+                        name = reader.value()
+                        reader.expect(":")
+                        yield name, reader.value()
+                        if reader.peek() == ",":
+                            reader.pos += 1
+                            continue
+                        reader.expect("}")
+                        break
+            else:
+                header[key] = reader.value()
+                if key == "schema_version":
+                    check_schema_version(header)
+            if reader.peek() == ",":
+                reader.pos += 1
+                continue
+            reader.expect("}")
+            break
+    if not found:
+        raise ValueError("Invalid template file format.")
+
+
+def load_templates(fp, size):
+    """Parse and validate an uploaded templates file (plain or gzip JSON) into a name -> Template mapping"""
+    compressed = fp.read(2) == GZIP_MAGIC
+    fp.seek(0)
+    if not compressed and size <= STREAMING_IMPORT_BYTES:
+        return parse_templates(json.load(fp))
+
+    # The decompressed size of a gzip upload is unknown, so it always streams
+    raw = gzip.GzipFile(fileobj=fp, mode="rb") if compressed else fp
+    stream = io.TextIOWrapper(raw, encoding="utf-8")
+    try:
+        header = {}
+        templates = {}
+        for name, data in iter_template_items(stream, header):
+            templates[name] = Template.from_dict(data, templates)
+        check_schema_version(header)
+        return templates
+    finally:
+        stream.detach()
@@ -0,0 +1,66 @@
+"""Task label layout: fit each label to its bar using cached text measurements"""
+import textwrap
+from functools import lru_cache
+
+# Line height as a multiple of the font size, as matplotlib lays out multi-line text
+LINE_SPACING = 1.2
+
+# Padding of the label background box on each side, as a fraction of the font size
+BOX_PAD = 0.3
+
+
+@lru_cache(maxsize=8192)
+def text_extent(text, fontsize, weight):
+    """(width, height) in points of a possibly multi-line text, measured once per text and font"""
+    from matplotlib.font_manager import FontProperties
+    from matplotlib.textpath import text_to_path
+
+    prop = FontProperties(size=fontsize, weight=weight)
+    lines = text.split("\n")
+    width = max(text_to_path.get_text_width_height_descent(line, prop, ismath=False)[0] for line in lines)
+    return width, len(lines) * fontsize * LINE_SPACING
+
+
+@lru_cache(maxsize=8192)
+def fit_label(label, duration, width, height, fontsize, weight, wrap):
+    """Text to draw in a bar of width x height points: the full label, an abbreviation or None.
+
+    Tries the wrapped label, the label on one line, the longest truncated name
+    that still fits (with its hours), and the hours alone, in that order.
+    """
+    pad = 2 * BOX_PAD * fontsize
+    room_width, room_height = width - pad, height - pad
+
+    def fits(text):
+        text_width, text_height = text_extent(text, fontsize, weight)
+        return text_width <= room_width and text_height <= room_height
+
+    for text in (textwrap.fill(f"{label}\n({duration}h)", width=wrap), f"{label} ({duration}h)"):
+        if fits(text):
+            return text
+
+    # Longest prefix of the name that fits; text width grows with the prefix, so bisect
+    suffix = f"… ({duration}h)"
+    best = None
+    low, high = 1, len(label) - 1
+    while low <= high:
+        middle = (low + high) // 2
+        text = label[:middle].rstrip() + suffix
+        if fits(text):
+            best, low = text, middle + 1
+        else:
+            high = middle - 1
+    if best is not None:
+        return best
+
+    hours = f"{duration}h"
+    return hours if fits(hours) else None
+
+
+def bar_scale(ax, max_hours, rows, bar_height):
+    """Points per hour along x and the height of a bar in points, from the axes' place in its figure"""
+    fig = ax.figure
+    box = ax.get_position()
+    width = box.width * fig.get_figwidth() * 72
+    height = box.height * fig.get_figheight() * 72
+    return width / max_hours, height / rows * bar_height
@@ -0,0 +1,157 @@
+"""Opt-in per-rerun profiling: section timings, matplotlib work and export sizes"""
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+_current = ContextVar("planner_profile", default=None)
+
+# Process-wide totals, exported as Prometheus counters
+_totals_lock = threading.Lock()
+_section_seconds = Counter()
+_section_runs = Counter()
+_counter_totals = Counter()
+
+
+class RerunProfile:
+    """Timings and counters collected during one script run; every method is a no-op when disabled"""
+
+    def __init__(self, enabled, on_finish=None):
+        self.enabled = enabled
+        self.on_finish = on_finish
+        self.thread = threading.get_ident()
+        self.started = time.perf_counter()
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.sections = {}
+        self.counters = Counter()
+        self.total = None
+        self.finished = False
+        self.interrupted = False
+
+    @contextmanager
+    def section(self, name):
+        """Time a block; leaving it through an exception (st.rerun, st.stop) ends the run"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self._record(name, start)
+            self.finish(interrupted=True)
+            raise
+        self._record(name, start)
+
+    def _record(self, name, start):
+        self.sections[name] = self.sections.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, value=1):
+        if self.enabled:
+            self.counters[name] += value
+
+    def finish(self, interrupted=False, jsonl_path=None, prometheus_path=None):
+        """Close the run once and append it to the configured outputs"""
+        if not self.enabled or self.finished:
+            return
+        self.finished = True
+        self.interrupted = interrupted
+        self.total = time.perf_counter() - self.started
+
+        with _totals_lock:
+            _section_seconds.update(self.sections)
+            _section_runs.update(self.sections.keys())
+            _section_seconds["total"] += self.total
+            _section_runs["total"] += 1
+            _counter_totals.update(self.counters)
+
+        jsonl_path = jsonl_path or os.environ.get("PLANNER_PROFILE_JSONL")
+        prometheus_path = prometheus_path or os.environ.get("PLANNER_PROFILE_PROM")
+        if jsonl_path:
+            with open(jsonl_path, "a") as out:
+                out.write(json.dumps(self.to_dict()) + "\n")
+        if prometheus_path:
+            write_prometheus(prometheus_path)
+        if self.on_finish is not None:
+            self.on_finish(self)
+
+    def to_dict(self):
+        return {
+            "started_at": self.started_at,
+            "total_s": round(self.total if self.total is not None else time.perf_counter() - self.started, 6),
+            "interrupted": self.interrupted,
+            "sections_s": {name: round(seconds, 6) for name, seconds in self.sections.items()},
+            "counters": dict(self.counters),
+        }
+
+
+_DISABLED = RerunProfile(enabled=False)
+
+
+def activate(profile):
+    """Make profile the one returned by current_profile() in this thread"""
+    _current.set(profile)
+    return profile
+
+
+def current_profile():
+    return _current.get() or _DISABLED
+
+
+def fragment_profile(requested, on_finish=None):
+    """Return (profile, started) for a fragment body: the run's profile, or a new one it must finish
+
+    A rerun of just a fragment happens in a new script thread, which does not see the profile
+    of the full run before it, so it starts its own when profiling was requested.
+    """
+    profile = current_profile()
+    if profile.enabled and not profile.finished and profile.thread == threading.get_ident():
+        return profile, False
+    if not requested:
+        return _DISABLED, False
+    return activate(RerunProfile(True, on_finish=on_finish)), True
+
+
+def profiling_requested(query_params=None):
+    """True when PLANNER_PROFILE is set or the page was opened with ?profile=1"""
+    if os.environ.get("PLANNER_PROFILE", "").lower() in ("1", "true", "yes"):
+        return True
+    return bool(query_params) and query_params.get("profile") in ("1", "true")
+
+
+def write_prometheus(path):
+    """Write process-wide totals in the node_exporter textfile format, replacing the file atomically"""
+    with _totals_lock:
+        lines = [
+            "# HELP planner_section_seconds_total Time spent in each app section.",
+            "# TYPE planner_section_seconds_total counter",
+        ]
+        lines += [
+            f'planner_section_seconds_total{{section="{name}"}} {seconds:.6f}'
+            for name, seconds in sorted(_section_seconds.items())
+        ]
+        lines += [
+            "# HELP planner_section_runs_total Number of runs that entered each app section.",
+            "# TYPE planner_section_runs_total counter",
+        ]
+        lines += [
+            f'planner_section_runs_total{{section="{name}"}} {runs}'
+            for name, runs in sorted(_section_runs.items())
+        ]
+        for name, value in sorted(_counter_totals.items()):
+            lines += [f"# TYPE planner_{name}_total counter", f"planner_{name}_total {value}"]
+
+    # A temp file of its own per call, since sessions finishing together write concurrently
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as out:
+            out.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
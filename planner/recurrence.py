@@ -0,0 +1,108 @@
+"""Repeating tasks stored as compact rules and expanded lazily for the dates being viewed"""
+import heapq
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from .core import DAYS, Task
+
+
+def week_start(day):
+    """The Monday of the week containing day"""
+    return day - timedelta(days=day.weekday())
+
+
+@dataclass(frozen=True, slots=True)
+class Recurrence:
+    """A task repeated on the given weekdays every `every` weeks from start, up to until (inclusive).
+
+    A rule costs the same whatever span it covers; occurrences exist only while
+    a window of dates is being expanded.
+    """
+    task: Task
+    days: tuple
+    start: date
+    every: int = 1
+    until: date = None
+
+    def __post_init__(self):
+        if self.every < 1:
+            raise ValueError("a recurrence repeats every 1 or more weeks")
+        unknown = set(self.days) - set(DAYS)
+        if unknown:
+            raise ValueError(f"unknown days in recurrence: {sorted(unknown)}")
+
+    def occurrences(self, start, end):
+        """Yield the dates in [start, end) the rule falls on"""
+        first = max(start, self.start)
+        last = end if self.until is None else min(end, self.until + timedelta(days=1))
+        anchor = week_start(self.start)
+        weekdays = {DAYS.index(day) for day in self.days}
+        current = first
+        while current < last:
+            weeks = (current - anchor).days // 7
+            if weeks % self.every:
+                # Skip straight to the Monday of the next week the rule is active in
+                current = anchor + timedelta(weeks=weeks + self.every - weeks % self.every)
+                continue
+            if current.weekday() in weekdays:
+                yield current
+            current += timedelta(days=1)
+
+    def describe(self):
+        if tuple(self.days) == tuple(DAYS[:5]):
+            days = "weekdays"
+        elif len(self.days) == len(DAYS):
+            days = "every day"
+        else:
+            days = ", ".join(day[:3] for day in self.days)
+        period = "every week" if self.every == 1 else f"every {self.every} weeks"
+        until = f" until {self.until.isoformat()}" if self.until else ""
+        return f"{self.task.name} ({self.task.duration}h) on {days}, {period}{until}"
+
+    def to_dict(self):
+        return {
+            "task": list(self.task),
+            "days": list(self.days),
+            "start": self.start.isoformat(),
+            "every": self.every,
+            "until": self.until.isoformat() if self.until else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            task=Task(*data["task"]),
+            days=tuple(data["days"]),
+            start=date.fromisoformat(data["start"]),
+            every=data.get("every", 1),
+            until=date.fromisoformat(data["until"]) if data.get("until") else None,
+        )
+
+
+def expand(rules, start, end):
+    """Yield (date, Task) for every occurrence of rules in [start, end), in date order"""
+    streams = [_tagged(rule, index, start, end) for index, rule in enumerate(rules)]
+    for day, _, task in heapq.merge(*streams):
+        yield day, task
+
+
+def _tagged(rule, index, start, end):
+    # The rule's position breaks ties between rules on the same day, keeping their order stable
+    for day in rule.occurrences(start, end):
+        yield day, index, rule.task
+
+
+def week_view(week, rules, monday):
+    """The week starting on monday with its repeating tasks added after each day's own tasks.
+
+    Returns week itself when no rule falls inside it, otherwise a copy; the
+    stored week is never changed.
+    """
+    occurrences = expand(rules, monday, monday + timedelta(days=len(DAYS)))
+    first = next(occurrences, None)
+    if first is None:
+        return week
+    view = week.copy()
+    for day, task in [first, *occurrences]:
+        view.add_task(DAYS[day.weekday()], task)
+    return view
@@ -0,0 +1,264 @@
+"""Matplotlib rendering of a week; matplotlib is imported only when a chart is drawn"""
+import io
+
+import numpy as np
+
+from .arrays import WeekArrays
+from .colors import BLACK_TEXT, WHITE_TEXT, color_table
+from .labels import bar_scale, fit_label
+from .core import DAYS
+from .profiling import current_profile
+
+# Shared styling for every schedule figure (live chart and export)
+CHART_STYLE = {
+    "bar_height": 0.7,
+    "saturation_boost": 1.4,
+    "brightness_boost": 1.1,
+    "label_fontsize": 14,
+    "label_wrap": 35,
+}
+
+# Axes styling shared by every schedule figure, applied once per figure through
+# rc_context instead of per-axes tick, spine and colour calls
+CHART_RC = {
+    "axes.facecolor": "#1A1A1A",
+    "axes.edgecolor": "#39FF14",
+    "axes.linewidth": 3,
+    "axes.spines.top": False,
+    "axes.spines.right": False,
+    "xtick.color": "#FFFFFF",
+    "ytick.color": "#FFFFFF",
+    "xtick.labelsize": 12,
+    "ytick.labelsize": 12,
+    "xtick.major.width": 2,
+    "ytick.major.width": 2,
+    "xtick.major.size": 6,
+    "ytick.major.size": 6,
+}
+
+# Fill of every task on an overbooked day: #FF4444 at 90% opacity
+OVERBOOKED_RGBA = (1.0, 0x44 / 255, 0x44 / 255, 0.9)
+
+LABEL_WEIGHT = "900"
+
+DAY_LABELS = tuple(f"💪 {day}" for day in DAYS)
+
+# Export profiles: name -> (format, dpi, mime type). Vector output scales with
+# the number of tasks drawn rather than with the pixel count.
+EXPORT_PROFILES = {
+    "screen": ("png", 100, "image/png"),
+    "print": ("png", 300, "image/png"),
+    "svg": ("svg", 72, "image/svg+xml"),
+    "pdf": ("pdf", 72, "application/pdf"),
+}
+
+
+def chart_style():
+    """Context in which schedule figures and axes are created"""
+    import matplotlib
+
+    return matplotlib.rc_context(CHART_RC)
+
+
+def warm_up(style=CHART_STYLE):
+    """Load matplotlib, the fonts and glyphs the charts use and the palette's colours by drawing a tiny sample chart.
+
+    Run once per process, so the first real chart does not pay for the font
+    lookups (bold, weight 900, emoji day labels) and the backend imports.
+    """
+    import matplotlib.pyplot as plt
+
+    from .core import Task, Week
+    from .goals import COLOR_PALETTE
+
+    # Palette colours are derived up front; picker colours join the table as they appear
+    color_table(style).lookup(COLOR_PALETTE)
+
+    week = Week()
+    week.set_focus_hours(DAYS[0], 2)
+    week.add_task(DAYS[0], Task(1, "Warm up", "#4A90E2"))
+    with chart_style():
+        fig, ax = plt.subplots(figsize=(2, 1))
+    render_week(ax, week, 2, style)()
+    fig.savefig(io.BytesIO(), format="png", dpi=20)
+    plt.close(fig)
+
+
+def render_week(ax, week, max_hours, style):
+    """Draw a whole week onto ax, created under chart_style(), as batched bar collections.
+
+    Returns a function that adds the task labels. Labels are fitted to the bars'
+    size on the figure, so call it once the axes has its final position, after
+    any tight_layout.
+    """
+    from matplotlib.collections import PolyCollection
+
+    half = style["bar_height"] / 2
+
+    # Ticks, spines and background come from CHART_RC when the axes was created
+    ax.set_xlabel("Hours", fontsize=16, fontweight="bold", color="#39FF14", labelpad=15)
+    ax.grid(axis="x", linestyle="-", alpha=0.2, color="#39FF14", linewidth=1.5)
+    ax.grid(axis="y", linestyle="--", alpha=0.1, color="#666666", linewidth=1)
+
+    # Geometry and colours for every bar come from the week's arrays in one pass
+    arrays = WeekArrays.from_week(week)
+    background_days = np.flatnonzero(arrays.focus_hours > 0)
+    background_verts = _bar_verts(np.zeros(len(background_days)), arrays.focus_hours[background_days],
+                                  background_days, half)
+
+    starts = arrays.starts()
+    ends = starts + arrays.durations
+    bar_verts = _bar_verts(starts, ends, arrays.day_index, half)
+
+    # More vibrant colours from the shared colour table; bright red for overbooked
+    vibrant, dark = color_table(style).lookup(arrays.colors)
+    text_colors = np.where(dark, WHITE_TEXT, BLACK_TEXT).tolist()
+    overbooked = arrays.task_overbooked()
+    bar_faces = np.empty((len(arrays), 4))
+    if len(arrays):
+        bar_faces[:, :3] = vibrant[arrays.color_index]
+        bar_faces[:, 3] = 0.95
+        bar_faces[overbooked] = OVERBOOKED_RGBA
+    bar_widths = np.where(overbooked, 3, 2)
+
+    # Background allocated hours bars
+    if len(background_verts):
+        ax.add_collection(PolyCollection(
+            background_verts, facecolors="#2A2A2A", edgecolors="#444444",
+            linewidths=2, alpha=0.6, zorder=1
+        ))
+
+    # All task bars of the week as a single artist
+    if len(bar_verts):
+        ax.add_collection(PolyCollection(
+            bar_verts, facecolors=bar_faces, edgecolors="#FFFFFF",
+            linewidths=bar_widths, zorder=2
+        ))
+
+    # Bold day labels and hour markers (every 2 hours for cleaner look)
+    ax.set_yticks(range(len(DAYS)))
+    ax.set_yticklabels(DAY_LABELS, fontsize=14, fontweight="bold", color="#FFFFFF")
+    ax.set_xticks(range(0, max_hours+1, 2))
+    ax.set_xlim(0, max_hours)
+    ax.set_ylim(len(DAYS) - 0.5, -0.5)
+
+    # Add subtle background pattern
+    for i in range(len(DAYS)):
+        if i % 2 == 0:
+            ax.axhspan(i-0.4, i+0.4, alpha=0.05, color="#39FF14", zorder=0)
+
+    def add_labels():
+        # Fit each label to its bar; labels that fit in no form are not drawn at all
+        per_hour, bar_points = bar_scale(ax, max_hours, len(DAYS), style["bar_height"])
+        drawn = 0
+        for x, y, label, duration, c in zip(
+                ((starts + ends) / 2).tolist(), arrays.day_index.tolist(),
+                arrays.names, arrays.durations.tolist(), arrays.color_index.tolist()):
+            text = fit_label(label, duration, duration * per_hour, bar_points,
+                             style["label_fontsize"], LABEL_WEIGHT, style["label_wrap"])
+            if text is None:
+                continue
+            # Bold text styling, one artist per visible label
+            ax.text(x, y, text,
+                    ha="center", va="center", color=text_colors[c],
+                    fontsize=style["label_fontsize"], fontweight=LABEL_WEIGHT, zorder=4,
+                    backgroundcolor="#00000022")
+            drawn += 1
+        current_profile().count("labels_culled", len(arrays) - drawn)
+
+    return add_labels
+
+
+def _bar_verts(x0, x1, y, half):
+    """Rectangle vertices of shape (n, 4, 2) for bars spanning x0..x1 centred on rows y"""
+    bottom, top = y - half, y + half
+    return np.stack([
+        np.stack([x0, bottom], axis=-1), np.stack([x0, top], axis=-1),
+        np.stack([x1, top], axis=-1), np.stack([x1, bottom], axis=-1),
+    ], axis=1)
+
+
+def render_export(week, max_hours, fmt="png", dpi=300, style=CHART_STYLE):
+    """Render the complete schedule (with heading) to image bytes in the given format"""
+    import matplotlib.pyplot as plt
+
+    # Create new figure with heading - increased height for proper spacing
+    with chart_style():
+        complete_fig = plt.figure(figsize=(25, 12))
+    complete_fig.patch.set_facecolor("#0A0A0A")
+
+    # Add title at top with more space
+    complete_fig.suptitle("Weekly Focus Schedule",
+                          fontsize=28, fontweight='bold', color='#39FF14', y=0.95)
+
+    # Create subplot for the main chart - moved down to give title more room
+    with chart_style():
+        ax = complete_fig.add_subplot(111)
+    ax.set_position([0.08, 0.08, 0.85, 0.8])  # [left, bottom, width, height]
+    render_week(ax, week, max_hours, style)()
+
+    # Drop the creation date from vector output so identical weeks give identical files
+    metadata = {"Date": None} if fmt in ("svg", "pdf") else None
+    buf = io.BytesIO()
+    complete_fig.savefig(buf, format=fmt, dpi=dpi, bbox_inches='tight',
+                         facecolor="#0A0A0A", edgecolor='none', metadata=metadata)
+    _record_render(complete_fig, buf, "export")
+    plt.close(complete_fig)  # Close to free memory
+    return buf.getvalue()
+
+
+def render_export_profile(week, max_hours, profile, style=CHART_STYLE):
+    """Render the complete schedule with one of EXPORT_PROFILES"""
+    fmt, dpi, _ = EXPORT_PROFILES[profile]
+    return render_export(week, max_hours, fmt, dpi, style)
+
+
+def render_chart_png(week, max_hours, style=CHART_STYLE):
+    """Render the on-screen timeline to PNG bytes and release the figure"""
+    import matplotlib.pyplot as plt
+
+    with chart_style():
+        fig, ax = plt.subplots(figsize=(20, 8))
+
+    # Bold dark theme
+    fig.patch.set_facecolor("#0A0A0A")
+    add_labels = render_week(ax, week, max_hours, style)
+    plt.tight_layout(pad=2.0)
+    add_labels()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=200, bbox_inches="tight", facecolor=fig.get_facecolor())
+    _record_render(fig, buf, "chart")
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def render_window_png(weeks, max_hours, style=CHART_STYLE):
+    """Render consecutive weeks, given as (title, week) pairs, as stacked timelines in one image"""
+    import matplotlib.pyplot as plt
+
+    with chart_style():
+        fig, axes = plt.subplots(len(weeks), 1, figsize=(20, 7 * len(weeks)), squeeze=False)
+    fig.patch.set_facecolor("#0A0A0A")
+    label_passes = []
+    for ax, (title, week) in zip(axes[:, 0], weeks):
+        label_passes.append(render_week(ax, week, max_hours, style))
+        ax.set_title(title, fontsize=18, fontweight="bold", color="#39FF14", loc="left", pad=12)
+    plt.tight_layout(pad=2.0)
+    for add_labels in label_passes:
+        add_labels()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=100, bbox_inches="tight", facecolor=fig.get_facecolor())
+    _record_render(fig, buf, "window")
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def _record_render(fig, buf, kind):
+    """Count the artists, savefig call and output bytes of a render in the active profile"""
+    profile = current_profile()
+    if profile.enabled:
+        profile.count("artists", len(fig.findobj()))
+        profile.count("savefig")
+        profile.count(f"{kind}_bytes", buf.tell())
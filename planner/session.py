@@ -0,0 +1,398 @@
+"""Session state kept outside the app process, so sessions survive restarts and any replica can serve them"""
+import atexit
+import gzip
+import json
+import logging
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from urllib.parse import unquote, urlparse
+
+from .core import Week
+from .horizon import Horizon
+from .recurrence import Recurrence
+
+# Sessions untouched for this long are dropped by the backends
+SESSION_TTL = 30 * 24 * 3600
+
+# Encoded fields longer than this are gzipped
+COMPRESS_OVER = 1024
+
+# Seconds the writer waits after a mutation, so a burst of edits is written once
+WRITE_DELAY = 0.2
+
+# Failed writes of a session retried before its queued changes are dropped, and the first pause between them
+WRITE_RETRIES = 5
+RETRY_DELAY = 1.0
+
+# Seconds allowed at interpreter exit for queued changes to reach the backend
+EXIT_FLUSH_TIMEOUT = 10
+
+logger = logging.getLogger(__name__)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value BLOB NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (session_id, field)
+);
+CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+"""
+
+
+# --- Encoding: one compact value per field, so a change rewrites only its own field ---
+
+def _pack(value):
+    data = json.dumps(value, separators=(",", ":")).encode("utf-8")
+    return gzip.compress(data, mtime=0) if len(data) > COMPRESS_OVER else data
+
+
+def _unpack(data):
+    if data[:2] == b"\x1f\x8b":
+        data = gzip.decompress(data)
+    return json.loads(data)
+
+
+def encode_week(week, monday):
+    """The week being edited and its Monday, with empty days left out"""
+    return _pack({
+        "start": monday.isoformat(),
+        "tasks": {day: [list(task) for task in plan.tasks] for day, plan in week if plan.tasks},
+        "focus_hours": {day: plan.focus_hours for day, plan in week if plan.focus_hours},
+    })
+
+
+def decode_week(data):
+    """(Week, Monday) from encode_week"""
+    fields = _unpack(data)
+    return Week.from_dict(fields["tasks"], fields["focus_hours"]), date.fromisoformat(fields["start"])
+
+
+def encode_goals(goal_colors):
+    return _pack(goal_colors)
+
+
+def decode_goals(data):
+    return _unpack(data)
+
+
+def encode_recurrences(rules):
+    return _pack([rule.to_dict() for rule in rules])
+
+
+def decode_recurrences(data):
+    return [Recurrence.from_dict(rule) for rule in _unpack(data)]
+
+
+def encode_horizon(horizon):
+    return _pack(horizon.to_dict())
+
+
+def decode_horizon(data):
+    return Horizon.from_dict(_unpack(data))
+
+
+# --- Backends: load() reads a whole session in one round trip, save() writes fields in one ---
+
+class MemoryBackend:
+    """Sessions in this process only; they end with it"""
+
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Session id -> (fields, time of last save), least recently saved first
+        self._sessions = OrderedDict()
+
+    def load(self, session_id):
+        with self._lock:
+            self._expire(time.time())
+            entry = self._sessions.get(session_id)
+            return dict(entry[0]) if entry else {}
+
+    def save(self, session_id, fields):
+        now = time.time()
+        with self._lock:
+            stored, _ = self._sessions.pop(session_id, ({}, now))
+            stored.update(fields)
+            self._sessions[session_id] = (stored, now)
+            self._expire(now)
+
+    def _expire(self, now):
+        """Drop sessions saved longer than ttl ago; only the expired ones are visited"""
+        while self._sessions:
+            session_id, (_, saved_at) = next(iter(self._sessions.items()))
+            if saved_at >= now - self.ttl:
+                break
+            del self._sessions[session_id]
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend:
+    """Sessions in a SQLite file, shared by app processes on the same host or volume"""
+
+    def __init__(self, path, ttl=SESSION_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def load(self, session_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT field, value FROM sessions WHERE session_id = ? AND updated_at >= ?",
+                (session_id, time.time() - self.ttl)
+            ).fetchall()
+        return {field: bytes(value) for field, value in rows}
+
+    def save(self, session_id, fields):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sessions (session_id, field, value, updated_at) VALUES (?, ?, ?, ?)",
+                [(session_id, field, value, now) for field, value in fields.items()]
+            )
+            # Keep the session's other fields alive, and let expired sessions go
+            self._conn.execute("UPDATE sessions SET updated_at = ? WHERE session_id = ?", (now, session_id))
+            self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (now - self.ttl,))
+
+    def delete(self, session_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RedisBackend:
+    """Sessions in Redis (or any server speaking its protocol), one hash per session.
+
+    Talks RESP over a plain socket, pipelining each load and save into a
+    single round trip, so no client library is needed.
+    """
+
+    def __init__(self, host="localhost", port=6379, db=0, password=None, prefix="planner:session:",
+                 ttl=SESSION_TTL, timeout=5):
+        self.address = (host, port)
+        self.db = db
+        self.password = password
+        self.prefix = prefix
+        self.ttl = ttl
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock = None
+        self._reader = None
+
+    @classmethod
+    def from_url(cls, url, **options):
+        """Backend for a redis://[:password@]host[:port][/db] URL"""
+        parts = urlparse(url)
+        db = parts.path.lstrip("/")
+        return cls(
+            host=parts.hostname or "localhost",
+            port=parts.port or 6379,
+            db=int(db) if db else 0,
+            password=unquote(parts.password) if parts.password else None,
+            **options,
+        )
+
+    def _connect(self):
+        self._sock = socket.create_connection(self.address, timeout=self.timeout)
+        self._reader = self._sock.makefile("rb")
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            try:
+                self._send(setup)
+            except RuntimeError:
+                self._disconnect()
+                raise
+
+    def _disconnect(self):
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+        self._sock = self._reader = None
+
+    def _send(self, commands):
+        """Send commands in one write and return their replies"""
+        out = bytearray()
+        for command in commands:
+            out += b"*%d\r\n" % len(command)
+            for arg in command:
+                if not isinstance(arg, bytes):
+                    arg = str(arg).encode("utf-8")
+                out += b"$%d\r\n%s\r\n" % (len(arg), arg)
+        self._sock.sendall(out)
+        # Read every reply before raising, so the connection stays in step
+        replies = [self._reply() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RuntimeError):
+                raise reply
+        return replies
+
+    def _reply(self):
+        line = self._reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("connection closed by the session server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest
+        if kind == b"-":
+            return RuntimeError(f"session server error: {rest.decode('utf-8', 'replace')}")
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self._reply() for _ in range(length)]
+        raise ConnectionError(f"unexpected reply from the session server: {line!r}")
+
+    def _execute(self, commands):
+        """Run a pipeline, reconnecting once if the connection has gone stale"""
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._send(commands)
+                except (ConnectionError, OSError):
+                    self._disconnect()
+                    if attempt:
+                        raise
+
+    def load(self, session_id):
+        flat = self._execute([("HGETALL", self.prefix + session_id)])[0]
+        return {flat[i].decode("utf-8"): flat[i + 1] for i in range(0, len(flat), 2)}
+
+    def save(self, session_id, fields):
+        key = self.prefix + session_id
+        hset = ["HSET", key]
+        for field, value in fields.items():
+            hset += [field, value]
+        self._execute([hset, ("EXPIRE", key, self.ttl)])
+
+    def delete(self, session_id):
+        self._execute([("DEL", self.prefix + session_id)])
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+
+def backend_from_url(url):
+    """Session backend for memory://, sqlite:///path/to/file.db or redis://host:port/db"""
+    if not url or url == "memory://":
+        return MemoryBackend()
+    scheme = urlparse(url).scheme
+    if scheme == "sqlite":
+        return SQLiteBackend(url[len("sqlite:///"):] if url.startswith("sqlite:///") else url[len("sqlite://"):])
+    if scheme in ("redis", "resp"):
+        return RedisBackend.from_url(url)
+    raise ValueError(f"unknown session store {url!r}; use memory://, sqlite:///<file> or redis://<host>")
+
+
+class SessionWriter:
+    """Write-behind for a backend: saves are queued and written by a background thread.
+
+    Fields saved again before they are written replace the queued value, so a
+    burst of edits costs one write. load() sees queued fields, so a session
+    reopened in this process never reads stale values. A session whose writes
+    keep failing is retried with growing pauses, then its changes are dropped;
+    whatever is queued at interpreter exit is flushed first.
+    """
+
+    def __init__(self, backend, delay=WRITE_DELAY, retries=WRITE_RETRIES, retry_delay=RETRY_DELAY):
+        self.backend = backend
+        self.delay = delay
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._failures = {}
+        self._writing = False
+        self._thread = threading.Thread(target=self._run, name="session-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self._flush_at_exit)
+
+    def load(self, session_id):
+        """All stored fields of a session, with queued writes applied"""
+        fields = self.backend.load(session_id)
+        with self._cond:
+            fields.update(self._pending.get(session_id, {}))
+        return fields
+
+    def save(self, session_id, fields):
+        with self._cond:
+            self._pending.setdefault(session_id, {}).update(fields)
+            self._cond.notify()
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is written; False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._writing, timeout)
+
+    def _flush_at_exit(self):
+        if not self.flush(EXIT_FLUSH_TIMEOUT):
+            with self._cond:
+                lost = ", ".join(self._pending)
+            logger.error("Session changes still queued at exit were lost: %s", lost)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+            time.sleep(self.delay)
+            with self._cond:
+                batch, self._pending = self._pending, {}
+                self._writing = True
+            failed = {}
+            for session_id, fields in batch.items():
+                try:
+                    self.backend.save(session_id, fields)
+                except Exception:
+                    attempts = self._failures.get(session_id, 0) + 1
+                    if attempts > self.retries:
+                        logger.exception("Dropping changes to session %s after %d failed writes", session_id, attempts)
+                        self._failures.pop(session_id)
+                    else:
+                        logger.warning("Writing session %s failed (attempt %d), retrying", session_id, attempts,
+                                       exc_info=True)
+                        self._failures[session_id] = attempts
+                        failed[session_id] = fields
+                else:
+                    self._failures.pop(session_id, None)
+            with self._cond:
+                # Retry failed fields unless they were saved again meanwhile
+                for session_id, fields in failed.items():
+                    pending = self._pending.setdefault(session_id, {})
+                    for field, value in fields.items():
+                        pending.setdefault(field, value)
+                self._writing = False
+                self._cond.notify_all()
+            if failed:
+                time.sleep(self.retry_delay * 2 ** (max(self._failures.values(), default=1) - 1))
@@ -0,0 +1,290 @@
+"""Persistent template library backed by SQLite"""
+import copy
+import json
+import sqlite3
+import threading
+from collections import deque
+
+from .core import DELTA_CANDIDATES, Template, smallest_delta
+
+# Each owner (a browser session) has a library of its own; base names refer to the same owner
+TEMPLATES_TABLE = """
+CREATE TABLE IF NOT EXISTS templates (
+    owner TEXT NOT NULL,
+    name TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    total_tasks INTEGER NOT NULL,
+    total_focus_hours INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    base TEXT,
+    depth INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (owner, name)
+)
+"""
+
+SCHEMA = TEMPLATES_TABLE + """;
+CREATE TABLE IF NOT EXISTS versions (
+    owner TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS templates_owner_created_at ON templates (owner, created_at);
+CREATE INDEX IF NOT EXISTS templates_owner_base ON templates (owner, base);
+"""
+
+BUMP_VERSION = (
+    "INSERT INTO versions (owner, value) VALUES (?, 1) ON CONFLICT (owner) DO UPDATE SET value = value + 1"
+)
+
+# Longest chain of deltas a template may sit at the end of, bounding the cost of loading it
+MAX_DELTA_DEPTH = 8
+
+# A template's row and the rows of the bases it is stored against, root first
+CHAIN = """
+WITH RECURSIVE chain (name, created_at, base, data, level) AS (
+    SELECT name, created_at, base, data, 0 FROM templates WHERE owner = ? AND name = ?
+    UNION ALL
+    SELECT t.name, t.created_at, t.base, t.data, chain.level + 1
+    FROM templates t JOIN chain ON t.owner = ? AND t.name = chain.base
+)
+SELECT name, created_at, base, data FROM chain ORDER BY level DESC
+"""
+
+
+class TemplateStore:
+    """Template library stored one row per template, so saves and deletes touch a single row.
+
+    A template similar to one already stored is kept as a delta against it
+    (its "base"), so a library of near-identical weeks grows with their
+    differences. Deltas are resolved on load into new Template objects.
+
+    The file holds one library per owner. A store reads and writes the library
+    of its owner only; for_owner() gives the library of another owner on the
+    same connection.
+
+    The connection runs in WAL mode so several Streamlit sessions (threads or
+    processes) can read while one of them writes.
+    """
+
+    def __init__(self, path, owner=""):
+        self.path = path
+        self.owner = owner
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(templates)")}
+        # Libraries created before templates were delta-encoded hold only full rows
+        if "base" not in columns:
+            self._conn.execute("ALTER TABLE templates ADD COLUMN base TEXT")
+            self._conn.execute("ALTER TABLE templates ADD COLUMN depth INTEGER NOT NULL DEFAULT 0")
+        # Libraries created before templates had owners become the library of the owner ""
+        if "owner" not in columns:
+            self._conn.executescript(
+                "ALTER TABLE templates RENAME TO templates_unowned;" + TEMPLATES_TABLE + """;
+                INSERT INTO templates (owner, name, created_at, total_tasks, total_focus_hours, data, base, depth)
+                SELECT '', name, created_at, total_tasks, total_focus_hours, data, base, depth FROM templates_unowned;
+                DROP TABLE templates_unowned;
+                """
+            )
+        self._conn.executescript(INDEXES)
+        self._conn.commit()
+
+    def for_owner(self, owner):
+        """The library of owner, sharing this store's connection"""
+        library = copy.copy(self)
+        library.owner = owner
+        return library
+
+    def close(self):
+        """Close the connection, which every library taken with for_owner() shares"""
+        with self._lock:
+            self._conn.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def __len__(self):
+        return self._execute("SELECT COUNT(*) FROM templates WHERE owner = ?", (self.owner,))[0][0]
+
+    def __contains__(self, name):
+        return bool(self._execute("SELECT 1 FROM templates WHERE owner = ? AND name = ?", (self.owner, name)))
+
+    def version(self):
+        """Counter bumped by every write, so callers can cache work derived from the library"""
+        rows = self._execute("SELECT value FROM versions WHERE owner = ?", (self.owner,))
+        return rows[0][0] if rows else 0
+
+    def names(self, order_by="name"):
+        """Template names, sorted by name or by creation time (newest first)"""
+        if order_by == "created_at":
+            sql = "SELECT name FROM templates WHERE owner = ? ORDER BY created_at DESC, name"
+        else:
+            sql = "SELECT name FROM templates WHERE owner = ? ORDER BY name"
+        return [row[0] for row in self._execute(sql, (self.owner,))]
+
+    def summary(self, name):
+        """created_at, total_tasks and total_focus_hours of a template, without decoding it"""
+        rows = self._execute(
+            "SELECT created_at, total_tasks, total_focus_hours FROM templates WHERE owner = ? AND name = ?",
+            (self.owner, name)
+        )
+        if not rows:
+            return None
+        created_at, total_tasks, total_focus_hours = rows[0]
+        return {"created_at": created_at, "total_tasks": total_tasks, "total_focus_hours": total_focus_hours}
+
+    def get(self, name):
+        with self._lock:
+            return self._load(name, {})
+
+    def items(self):
+        """Iterate over (name, Template) pairs in name order"""
+        rows = self._execute(
+            "SELECT name, created_at, base, data FROM templates WHERE owner = ? ORDER BY name", (self.owner,)
+        )
+        by_name = {row[0]: row for row in rows}
+        loaded = {}
+        for name in by_name:
+            yield name, _materialize(name, by_name, loaded)
+
+    def save(self, name, template):
+        self.save_many({name: template})
+
+    def save_many(self, templates):
+        """Insert or overwrite templates in a single transaction"""
+        with self._lock, self._conn:
+            self._write_many(templates)
+            self._conn.execute(BUMP_VERSION, (self.owner,))
+
+    def replace_all(self, templates):
+        """Replace the whole library with templates, atomically"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM templates WHERE owner = ?", (self.owner,))
+            self._write_many(templates)
+            self._conn.execute(BUMP_VERSION, (self.owner,))
+
+    def snapshot(self, names):
+        """Full rows of the named templates (None where absent), for restoring them later"""
+        found = {}
+        with self._lock:
+            loaded = {}
+            for name in names:
+                template = self._load(name, loaded)
+                found[name] = None if template is None else _full_row(name, template)
+        return found
+
+    def restore(self, rows):
+        """Write back rows taken by snapshot in a single transaction; None deletes the template"""
+        with self._lock, self._conn:
+            for name, row in rows.items():
+                self._detach_children(name)
+                if row is None:
+                    self._conn.execute("DELETE FROM templates WHERE owner = ? AND name = ?", (self.owner, name))
+                else:
+                    self._conn.execute(INSERT_ROW, (self.owner, *row))
+            self._conn.execute(BUMP_VERSION, (self.owner,))
+
+    def delete(self, name):
+        with self._lock, self._conn:
+            self._detach_children(name)
+            self._conn.execute("DELETE FROM templates WHERE owner = ? AND name = ?", (self.owner, name))
+            self._conn.execute(BUMP_VERSION, (self.owner,))
+
+    # --- Delta encoding (callers hold the lock) ---
+
+    def _load(self, name, loaded):
+        """Materialize a template through its chain of bases, reusing templates already in loaded"""
+        chain = self._conn.execute(CHAIN, (self.owner, name, self.owner)).fetchall()
+        by_name = {row[0]: row for row in chain}
+        return _materialize(name, by_name, loaded) if name in by_name else None
+
+    def _detach_children(self, name):
+        """Store the templates based on name in full, before name is overwritten or deleted"""
+        children = [row[0] for row in self._conn.execute(
+            "SELECT name FROM templates WHERE owner = ? AND base = ?", (self.owner, name)
+        )]
+        loaded = {}
+        for child in children:
+            self._conn.execute(INSERT_ROW, (self.owner, *_full_row(child, self._load(child, loaded))))
+
+    def _candidates(self, name):
+        """Stored templates likely to resemble name: those sharing its first word, and the newest"""
+        prefix = name.split(" ", 1)[0]
+        return self._conn.execute(
+            "SELECT name, depth FROM templates WHERE owner = ? AND name != ? AND depth < ? "
+            "AND name LIKE ? ESCAPE '\\' ORDER BY created_at DESC LIMIT ?",
+            (self.owner, name, MAX_DELTA_DEPTH, _escape_like(prefix) + "%", DELTA_CANDIDATES)
+        ).fetchall() + self._conn.execute(
+            "SELECT name, depth FROM templates WHERE owner = ? AND name != ? AND depth < ? "
+            "ORDER BY created_at DESC LIMIT ?",
+            (self.owner, name, MAX_DELTA_DEPTH, DELTA_CANDIDATES)
+        ).fetchall()
+
+    def _write_many(self, templates):
+        """Store each template as a delta against the closest candidate, or in full"""
+        loaded = {}
+        depths = {}
+        recent = deque(maxlen=DELTA_CANDIDATES)
+        for name, template in templates.items():
+            self._detach_children(name)
+            loaded.pop(name, None)
+
+            candidates = dict(recent)
+            for candidate, depth in self._candidates(name):
+                if candidate not in candidates and candidate not in templates:
+                    candidates[candidate] = self._load(candidate, loaded)
+                    depths[candidate] = depth
+            base, delta = smallest_delta(template, [
+                (candidate, value) for candidate, value in candidates.items()
+                if candidate != name and depths[candidate] < MAX_DELTA_DEPTH
+            ])
+
+            if base is None:
+                row = _full_row(name, template)
+                depths[name] = 0
+            else:
+                row = (name, template.created_at, template.total_tasks, template.total_focus_hours,
+                       json.dumps(delta, separators=(",", ":")), base, depths[base] + 1)
+                depths[name] = depths[base] + 1
+            self._conn.execute(INSERT_ROW, (self.owner, *row))
+            loaded[name] = template
+            recent.append((name, template))
+
+
+INSERT_ROW = (
+    "INSERT OR REPLACE INTO templates (owner, name, created_at, total_tasks, total_focus_hours, data, base, depth) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def _full_row(name, template):
+    data = json.dumps(template.content(), separators=(",", ":"))
+    return (name, template.created_at, template.total_tasks, template.total_focus_hours, data, None, 0)
+
+
+def _materialize(name, rows, loaded):
+    """Resolve name from (name, created_at, base, data) rows, applying deltas from the root down"""
+    pending = []
+    current = name
+    while current not in loaded:
+        pending.append(current)
+        current = rows[current][2]
+        if current is None:
+            break
+    for current in reversed(pending):
+        _, created_at, base, data = rows[current]
+        fields = json.loads(data)
+        if base is None:
+            loaded[current] = Template.from_dict({**fields, "created_at": created_at})
+        else:
+            loaded[current] = loaded[base].patch(fields, created_at)
+    return loaded[name]
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
@@ -0,0 +1,100 @@
+"""Declarative Vega-Lite spec of a week, drawn by the browser instead of matplotlib"""
+import textwrap
+
+from .colors import color_table
+from .core import DAYS
+from .render import CHART_STYLE
+
+
+def week_to_vega_lite(week, max_hours, style=CHART_STYLE):
+    """Vega-Lite spec with the stacked-duration layout, overbooked highlighting and goal colours"""
+    allocated = []
+    bars = []
+    # Fill and text colours of every task, derived once per distinct colour
+    colors = [task.color for day in DAYS for task in week[day].tasks]
+    fills, texts = color_table(style).lookup_hex(colors)
+    task_index = 0
+    for day in DAYS:
+        plan = week[day]
+        if plan.focus_hours > 0:
+            allocated.append({"day": f"💪 {day}", "end": plan.focus_hours})
+
+        overbooked = plan.overbooked
+        start = 0
+        for duration, label, _ in plan.tasks:
+            bars.append({
+                "day": f"💪 {day}",
+                "start": start,
+                "end": start + duration,
+                "mid": start + duration / 2,
+                "task": label,
+                "label": textwrap.shorten(f"{label} ({duration}h)", width=style["label_wrap"], placeholder="…"),
+                "duration": duration,
+                "fill": "#FF4444" if overbooked else fills[task_index],
+                "stroke_width": 3 if overbooked else 2,
+                "text": texts[task_index],
+            })
+            start += duration
+            task_index += 1
+
+    y = {
+        "field": "day", "type": "nominal", "title": None,
+        "sort": [f"💪 {day}" for day in DAYS], "scale": {"domain": [f"💪 {day}" for day in DAYS]},
+    }
+    x_scale = {"domain": [0, max_hours], "nice": False}
+    layers = [
+        {
+            "data": {"values": allocated},
+            "mark": {"type": "bar", "color": "#2A2A2A", "stroke": "#444444", "strokeWidth": 2, "opacity": 0.6},
+            "encoding": {
+                "y": y,
+                "x": {"datum": 0, "type": "quantitative", "scale": x_scale},
+                "x2": {"field": "end"},
+            },
+        },
+        {
+            "data": {"values": bars},
+            "layer": [
+                {
+                    "mark": {"type": "bar", "stroke": "#FFFFFF", "opacity": 0.95},
+                    "encoding": {
+                        "y": y,
+                        "x": {"field": "start", "type": "quantitative", "scale": x_scale, "title": "Hours"},
+                        "x2": {"field": "end"},
+                        "color": {"field": "fill", "type": "nominal", "scale": None, "legend": None},
+                        "strokeWidth": {"field": "stroke_width", "type": "quantitative", "scale": None},
+                        "tooltip": [
+                            {"field": "task", "title": "Task"},
+                            {"field": "duration", "title": "Hours"},
+                        ],
+                    },
+                },
+                {
+                    "mark": {"type": "text", "fontWeight": "bold", "fontSize": style["label_fontsize"]},
+                    "encoding": {
+                        "y": y,
+                        "x": {"field": "mid", "type": "quantitative", "scale": x_scale},
+                        "text": {"field": "label"},
+                        "color": {"field": "text", "type": "nominal", "scale": None, "legend": None},
+                    },
+                },
+            ],
+        },
+    ]
+    return {
+        "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
+        "height": 60 * len(DAYS),
+        "background": "#0A0A0A",
+        "layer": layers,
+        "config": {
+            "view": {"fill": "#1A1A1A", "stroke": None},
+            "axis": {
+                "labelColor": "#FFFFFF", "labelFontSize": 12, "labelFontWeight": "bold",
+                "titleColor": "#39FF14", "titleFontSize": 16, "domainColor": "#39FF14", "domainWidth": 3,
+                "tickColor": "#FFFFFF", "tickWidth": 2, "tickSize": 6,
+            },
+            "axisX": {"gridColor": "#39FF14", "gridOpacity": 0.2, "gridWidth": 1.5, "tickMinStep": 2},
+            "axisY": {"grid": False, "labelFontSize": 14},
+            "bar": {"height": {"band": style["bar_height"]}},
+        },
+    }
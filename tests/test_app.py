@@ -0,0 +1,40 @@
+"""The Streamlit app, driven through AppTest"""
+import os
+
+import pytest
+
+streamlit_testing = pytest.importorskip("streamlit.testing.v1")
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "weekly_schedule.py")
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("PLANNER_TEMPLATE_DB", str(tmp_path / "templates.db"))
+    at = streamlit_testing.AppTest.from_file(APP, default_timeout=60)
+    at.run()
+    assert not at.exception
+    return at
+
+
+def button(at, label):
+    return next(item for item in at.button if label in item.label)
+
+
+def add_task(at, name):
+    next(item for item in at.text_input if item.label == "Task name:").input(name)
+    button(at, "Add Task").click().run()
+    assert not at.exception
+
+
+def test_undoing_add_task_removes_the_goal_it_created(app):
+    add_task(app, "Deep work")
+    assert app.session_state["goal_colors"] == {"Deep work": "#4A90E2"}
+
+    button(app, "Undo").click().run()
+    assert app.session_state["week"].total_tasks == 0
+    assert app.session_state["goal_colors"] == {}
+
+    button(app, "Redo").click().run()
+    assert app.session_state["goal_colors"] == {"Deep work": "#4A90E2"}
+
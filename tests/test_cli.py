@@ -0,0 +1,53 @@
+"""Output layout of the batch renderer"""
+import gzip
+import os
+
+from planner import Task, Template, Week, dump_templates
+from planner.cli import plan_jobs
+
+
+def write_export(path, names, compress=False):
+    week = Week()
+    week.add_task("Monday", Task(2, "Deep work", "#4A90E2"))
+    template = Template.from_week(week, {"Deep work": "#4A90E2"})
+    data = dump_templates([(name, template) for name in names], compact=compress, compress=compress)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as out:
+        out.write(data if isinstance(data, bytes) else data.encode("utf-8"))
+
+
+def planned_paths(sources, output):
+    return [os.path.relpath(job[1], output) for job in plan_jobs(sources, output, ["png"], 72)]
+
+
+def test_sources_sharing_a_name_get_separate_folders(tmp_path):
+    write_export(str(tmp_path / "x" / "templates.json"), ["Routine"])
+    write_export(str(tmp_path / "y" / "templates.json"), ["Routine"])
+    write_export(str(tmp_path / "a.json"), ["Routine"])
+    write_export(str(tmp_path / "a.json.gz"), ["Routine"], compress=True)
+    sources = [str(tmp_path / "x" / "templates.json"), str(tmp_path / "y" / "templates.json"),
+               str(tmp_path / "a.json"), str(tmp_path / "a.json.gz")]
+    output = str(tmp_path / "out")
+
+    paths = planned_paths(sources, output)
+    assert len(set(paths)) == 4
+    assert paths[0] == os.path.join("templates", "routine.png")
+    assert paths[2] == os.path.join("a", "routine.png")
+    assert paths[1].startswith("templates-") and paths[3].startswith("a-")
+    # The layout depends only on the sources given, not on the run
+    assert planned_paths(sources, output) == paths
+
+
+def test_a_file_named_twice_is_planned_once(tmp_path):
+    write_export(str(tmp_path / "src" / "week.json"), ["Routine", "routine"])
+    output = str(tmp_path / "out")
+    paths = planned_paths([str(tmp_path / "src"), str(tmp_path / "src" / "week.json")], output)
+    assert len(paths) == 2 and len(set(paths)) == 2
+    assert all(path.startswith("week" + os.sep) for path in paths)
+
+
+def test_gzip_sources_are_read(tmp_path):
+    write_export(str(tmp_path / "b.json.gz"), ["Plan"], compress=True)
+    with open(tmp_path / "b.json.gz", "rb") as fp:
+        assert gzip.decompress(fp.read())
+    assert planned_paths([str(tmp_path / "b.json.gz")], str(tmp_path / "out")) == [os.path.join("b", "plan.png")]
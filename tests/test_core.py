@@ -0,0 +1,65 @@
+"""Week aggregates: every mutation must leave them as a full rescan would compute them"""
+import random
+from collections import Counter
+
+from planner import COPY_MODES, DAYS, FOCUS_MODES, Task, Week
+from planner.core import DEFAULT_MAX_HOURS
+
+
+def assert_aggregates(week):
+    plans = [plan for _, plan in week]
+    assert week.total_tasks == sum(len(plan.tasks) for plan in plans)
+    assert week.total_focus_hours == sum(plan.focus_hours for plan in plans)
+    assert week.days_with_tasks == sum(1 for plan in plans if plan.tasks)
+    assert week.days_with_focus_hours == sum(1 for plan in plans if plan.focus_hours > 0)
+    assert week._focus_counts == Counter(plan.focus_hours for plan in plans)
+    assert week.max_hours == (max(plan.focus_hours for plan in plans) or DEFAULT_MAX_HOURS)
+    for day, plan in week:
+        assert plan.used_hours == sum(task.duration for task in plan.tasks), day
+
+
+def random_tasks(rng):
+    return [Task(rng.randint(1, 5), f"Goal {rng.randrange(5)}", "#4A90E2") for _ in range(rng.randint(0, 4))]
+
+
+def test_random_mutations_keep_the_aggregates():
+    rng = random.Random(16)
+    week = Week()
+    for _ in range(3000):
+        day = rng.choice(DAYS)
+        plan = week[day]
+        operation = rng.choice(
+            ["add", "add", "update", "delete", "focus", "copy", "replace", "clear", "load"]
+        )
+        if operation == "add":
+            # Plain tuples are accepted too
+            task = (rng.randint(1, 5), f"Goal {rng.randrange(5)}", "#4A90E2")
+            week.add_task(day, Task(*task) if rng.random() < 0.9 else task)
+        elif operation == "update" and plan.tasks:
+            week.update_task(day, rng.randrange(len(plan.tasks)), Task(rng.randint(1, 5), "Edited", "#123456"))
+        elif operation == "delete" and plan.tasks:
+            week.delete_task(day, rng.randrange(len(plan.tasks)))
+        elif operation == "focus":
+            week.set_focus_hours(day, rng.choice([0, 0, 2, 4, 8, 12, 16]))
+        elif operation == "copy":
+            targets = rng.sample(DAYS, rng.randint(1, 3))
+            week.copy_tasks(random_tasks(rng), targets, rng.choice(COPY_MODES), rng.choice(FOCUS_MODES))
+        elif operation == "replace":
+            week.replace_day(day, rng.choice([0, 3, 8, 24]), random_tasks(rng))
+        elif operation == "clear" and rng.random() < 0.1:
+            week.clear()
+        elif operation == "load" and rng.random() < 0.1:
+            week.load(week.copy())
+        assert_aggregates(week)
+
+
+def test_every_copy_mode_pair():
+    for copy_mode in COPY_MODES:
+        for focus_mode in FOCUS_MODES:
+            week = Week()
+            week.set_focus_hours("Monday", 6)
+            week.add_task("Monday", Task(2, "Read", "#000000"))
+            week.copy_tasks([Task(3, "Gym", "#111111")], ["Monday", "Tuesday"], copy_mode, focus_mode)
+            assert_aggregates(week)
+            week.copy_tasks([], ["Monday"], copy_mode, focus_mode)
+            assert_aggregates(week)
@@ -0,0 +1,93 @@
+"""Goal matching: the index must pick the goal the original linear scan picked"""
+import random
+import re
+
+from planner.goals import GoalIndex, assign_goal_color
+
+
+def linear_match(goals, task_name):
+    """The scan the index replaced: the first goal sharing 60% of words or containing, or contained in, the name"""
+    clean_task = re.sub(r'[^\w\s]', '', task_name.lower().strip())
+    clean_words = set(clean_task.split())
+    for existing_goal in goals:
+        clean_existing = re.sub(r'[^\w\s]', '', existing_goal.lower().strip())
+        existing_words = set(clean_existing.split())
+        if clean_words and existing_words:
+            overlap = len(clean_words.intersection(existing_words))
+            min_words = min(len(clean_words), len(existing_words))
+            if (overlap / min_words >= 0.6) or (clean_task in clean_existing) or (clean_existing in clean_task):
+                return existing_goal
+    return None
+
+
+WORDS = ["deep", "work", "gym", "read", "reading", "run", "ab", "x", "study", "math", "Deep", "WORK"]
+PUNCTUATION = ["", "", "!", "...", "-", "'s", "?!"]
+
+
+def random_name(rng):
+    if rng.random() < 0.05:
+        return rng.choice(["!!", "...", " ", "-?-"])
+    words = [rng.choice(WORDS) + rng.choice(PUNCTUATION) for _ in range(rng.randint(1, 4))]
+    return rng.choice(["", " "]) + " ".join(words)
+
+
+def index_for(goals):
+    index = GoalIndex()
+    index.sync(goals)
+    return index
+
+
+def test_matches_the_linear_scan():
+    rng = random.Random(4)
+    for _ in range(3000):
+        goals = dict.fromkeys(random_name(rng) for _ in range(rng.randint(0, 12)))
+        task_name = random_name(rng)
+        assert index_for(goals).match(task_name) == linear_match(goals, task_name), (goals, task_name)
+
+
+def test_ties_go_to_the_first_goal():
+    goals = dict.fromkeys(["Reading list", "Deep reading", "Read"])
+    assert index_for(goals).match("reading") == "Reading list"
+    goals = dict.fromkeys(["Read", "Reading list"])
+    assert index_for(goals).match("reading") == "Read"
+
+
+def test_short_names():
+    goals = dict.fromkeys(["x", "Gym", "ab"])
+    index = index_for(goals)
+    for task_name in ["x", "ab", "a", "b", "gy", "xy", "Gym!"]:
+        assert index.match(task_name) == linear_match(goals, task_name), task_name
+    assert index.match("ab") == "ab" and index.match("a") == "ab"
+
+
+def test_punctuation_only_names_match_nothing():
+    goals = dict.fromkeys(["!!", "Deep work", "..."])
+    index = index_for(goals)
+    assert index.match("!!") is None and index.match("   ") is None
+    assert index.match("deep") == "Deep work"
+
+
+def test_sync_rebuilds_after_the_mapping_is_replaced_or_shrinks():
+    goals = {"Deep work": "#000000", "Gym": "#111111"}
+    index = index_for(goals)
+    assert index.match("gym") == "Gym"
+
+    goals.pop("Gym")
+    index.sync(goals)
+    assert index.match("gym") is None
+
+    replaced = {"Gym session": "#222222"}
+    index.sync(replaced)
+    assert index.match("deep work") is None and index.match("gym") == "Gym session"
+
+    replaced["Deep work"] = "#333333"
+    index.sync(replaced)
+    assert index.match("deep") == "Deep work"
+
+
+def test_assign_registers_only_unmatched_names():
+    goals = {"Deep work": "#000000"}
+    index = GoalIndex()
+    assert assign_goal_color(goals, index, "deep work!", ["#AAAAAA", "#BBBBBB"]) == "#000000"
+    assert assign_goal_color(goals, index, "Gym", ["#AAAAAA", "#BBBBBB"]) == "#BBBBBB"
+    assert list(goals) == ["Deep work", "Gym"] and index.match("gym") == "Gym"
@@ -0,0 +1,68 @@
+"""Undo/redo history: only what an action touched is kept"""
+from datetime import date
+
+from planner import Task, Week
+from planner.history import History, restore_goals
+from planner.recurrence import Recurrence
+
+
+def test_goal_changes_keep_only_the_named_goals():
+    week = Week()
+    goal_colors = {f"Goal {i}": "#000000" for i in range(1000)}
+    history = History()
+    with history.record("add task", week, ["Monday"], goal_colors=lambda: goal_colors, goals=["Deep work"]):
+        goal_colors["Deep work"] = "#4A90E2"
+        week.add_task("Monday", Task(2, "Deep work", "#4A90E2"))
+
+    change = history.undo(week)
+    assert change.goal_colors == {"Deep work": (None, "#4A90E2")}
+    goal_colors = restore_goals(goal_colors, change.goal_colors, 0)
+    assert "Deep work" not in goal_colors and len(goal_colors) == 1000
+    assert week["Monday"].tasks == []
+
+    change = history.redo(week)
+    goal_colors = restore_goals(goal_colors, change.goal_colors, 1)
+    assert goal_colors["Deep work"] == "#4A90E2"
+
+
+def test_recoloring_a_goal_restores_its_colour_in_place():
+    goal_colors = {"Gym": "#000000", "Read": "#111111"}
+    history = History()
+    with history.record("edit", Week(), goal_colors=lambda: goal_colors, goals=["Gym"]):
+        goal_colors["Gym"] = "#FFFFFF"
+    change = history.undo(Week())
+    assert restore_goals(goal_colors, change.goal_colors, 0) is goal_colors
+    assert goal_colors == {"Gym": "#000000", "Read": "#111111"}
+
+
+def test_replaced_mapping_is_diffed():
+    state = {"goal_colors": {"Gym": "#000000", "Read": "#111111"}}
+    history = History()
+    with history.record("load template", Week(), goal_colors=lambda: state["goal_colors"]):
+        state["goal_colors"] = {"Gym": "#000000", "Write": "#222222"}
+    change = history.undo(Week())
+    assert change.goal_colors == {"Read": ("#111111", None), "Write": (None, "#222222")}
+    assert restore_goals(state["goal_colors"], change.goal_colors, 0) == {"Gym": "#000000", "Read": "#111111"}
+
+
+def test_unchanged_action_records_nothing():
+    goal_colors = {"Gym": "#000000"}
+    history = History()
+    with history.record("noop", Week(), ["Monday"], goal_colors=lambda: goal_colors, goals=["Gym"]):
+        goal_colors["Gym"] = "#000000"
+    assert not history.can_undo()
+
+
+def test_repeat_rules_are_restored():
+    week = Week()
+    week.add_task("Monday", Task(1, "Gym", "#000000"))
+    state = {"rules": [Recurrence(Task(1, "Gym", "#000000"), ("Monday",), date(2026, 10, 12))]}
+    history = History()
+    with history.record("reset", week, ["Monday"], recurrences=lambda: state["rules"]):
+        week.clear()
+        state["rules"] = []
+
+    change = history.undo(week)
+    assert change.recurrences[0] == (Recurrence(Task(1, "Gym", "#000000"), ("Monday",), date(2026, 10, 12)),)
+    assert change.recurrences[1] == ()
+    assert week.total_tasks == 1
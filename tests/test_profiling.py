@@ -0,0 +1,78 @@
+"""Rerun profiles: fragment reruns on their own thread, and Prometheus output from many sessions"""
+import os
+import threading
+
+import pytest
+
+from planner.profiling import RerunProfile, activate, current_profile, fragment_profile
+
+
+@pytest.fixture(autouse=True)
+def no_active_profile():
+    yield
+    activate(None)
+
+
+def in_thread(target):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(target()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_fragment_in_the_full_run_uses_its_profile():
+    run = activate(RerunProfile(True))
+    assert fragment_profile(True) == (run, False)
+
+
+def test_fragment_rerun_on_a_new_thread_starts_its_own_profile():
+    activate(RerunProfile(True))
+    finished = []
+
+    def fragment_rerun():
+        assert not current_profile().enabled
+        profile, started = fragment_profile(True, on_finish=finished.append)
+        current_profile().count("templates_export_bytes", 100)
+        profile.finish()
+        return profile, started
+
+    profile, started = in_thread(fragment_rerun)
+    assert started and finished == [profile]
+    assert profile.counters["templates_export_bytes"] == 100
+
+
+def test_finished_or_unrequested_profiles_are_not_reused():
+    run = activate(RerunProfile(True))
+    run.finish()
+    profile, started = fragment_profile(True)
+    assert started and profile is not run and current_profile() is profile
+
+    activate(RerunProfile(False))
+    profile, started = fragment_profile(False)
+    assert not started and not profile.enabled
+
+
+def test_concurrent_prometheus_writes_do_not_collide(tmp_path):
+    path = str(tmp_path / "planner.prom")
+    errors = []
+
+    def finish_runs():
+        try:
+            for _ in range(50):
+                profile = RerunProfile(True)
+                with profile.section("editor"):
+                    pass
+                profile.finish(prometheus_path=path)
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=finish_runs) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert os.listdir(tmp_path) == ["planner.prom"]
+    with open(path) as prom:
+        assert 'planner_section_runs_total{section="editor"}' in prom.read()
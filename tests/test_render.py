@@ -0,0 +1,45 @@
+"""Chart rendering: labels are fitted to the axes' final size"""
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import pytest
+
+from planner import DAYS, Task, Week
+from planner import render
+
+
+@pytest.fixture
+def week():
+    week = Week()
+    for day in DAYS:
+        week.set_focus_hours(day, 8)
+        week.add_task(day, Task(3, "Deep work on the quarterly planning document", "#4A90E2"))
+    return week
+
+
+@pytest.mark.parametrize("draw", [
+    lambda week: render.render_chart_png(week, week.max_hours),
+    lambda week: render.render_window_png([("This week", week), ("Next week", week)], week.max_hours),
+])
+def test_labels_are_fitted_after_layout(monkeypatch, week, draw):
+    measured = []
+    bar_scale = render.bar_scale
+
+    def recording_bar_scale(ax, *args):
+        measured.append((ax, ax.get_position().bounds))
+        return bar_scale(ax, *args)
+
+    closed = []
+    monkeypatch.setattr(render, "bar_scale", recording_bar_scale)
+    monkeypatch.setattr(plt, "close", lambda fig: closed.append(fig))
+    draw(week)
+
+    assert measured
+    for ax, bounds in measured:
+        # The box the labels were fitted to is the one the chart was saved with
+        assert bounds == ax.get_position().bounds
+    monkeypatch.undo()
+    for fig in closed:
+        plt.close(fig)
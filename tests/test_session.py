@@ -0,0 +1,214 @@
+"""Session backends and the write-behind writer, with Redis played by a minimal RESP server"""
+import socket
+import socketserver
+import threading
+import time
+from datetime import date
+
+import pytest
+
+from planner import Task, Week
+from planner.session import (
+    MemoryBackend,
+    RedisBackend,
+    SessionWriter,
+    backend_from_url,
+    decode_goals,
+    decode_week,
+    encode_goals,
+    encode_week,
+)
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    """Just enough of Redis for the backend: AUTH, SELECT, HSET, HGETALL, EXPIRE and DEL"""
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        server = self.server
+        server.connections.append(self.connection)
+        while (command := self.read_command()) is not None:
+            server.commands.append(command)
+            name, args = command[0].upper(), command[1:]
+            with server.lock:
+                if name == b"AUTH":
+                    reply = b"+OK\r\n" if args[0] == server.password else b"-WRONGPASS invalid password\r\n"
+                elif name == b"SELECT":
+                    reply = b"+OK\r\n"
+                elif name == b"HSET":
+                    fields = server.data.setdefault(args[0], {})
+                    added = sum(key not in fields for key in args[1::2])
+                    fields.update(zip(args[1::2], args[2::2]))
+                    reply = b":%d\r\n" % added
+                elif name == b"HGETALL":
+                    fields = server.data.get(args[0], {})
+                    reply = b"*%d\r\n" % (2 * len(fields)) + b"".join(
+                        b"$%d\r\n%s\r\n" % (len(part), part) for item in fields.items() for part in item
+                    )
+                elif name == b"EXPIRE":
+                    server.ttls[args[0]] = int(args[1])
+                    reply = b":1\r\n"
+                elif name == b"DEL":
+                    reply = b":%d\r\n" % (server.data.pop(args[0], None) is not None)
+                else:
+                    reply = b"-ERR unknown command '%s'\r\n" % name
+            self.wfile.write(reply)
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, password=None):
+        super().__init__(("127.0.0.1", 0), RespHandler)
+        self.password = password
+        self.lock = threading.Lock()
+        self.data = {}
+        self.ttls = {}
+        self.commands = []
+        self.connections = []
+
+    def drop_connections(self):
+        """Close every client connection, as a server restart would"""
+        for connection in self.connections:
+            connection.shutdown(socket.SHUT_RDWR)
+        self.connections.clear()
+
+
+@pytest.fixture
+def resp_server():
+    server = RespServer(password=b"secret")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def redis_backend(server, password="secret", **options):
+    host, port = server.server_address
+    return RedisBackend.from_url(f"redis://:{password}@{host}:{port}/2", **options)
+
+
+def test_week_round_trip_leaves_out_empty_days():
+    week = Week()
+    week.set_focus_hours("Tuesday", 4)
+    week.add_task("Tuesday", Task(2, "Deep work", "#112233"))
+    data = encode_week(week, date(2026, 10, 12))
+    restored, monday = decode_week(data)
+    assert restored.to_dict() == week.to_dict()
+    assert monday == date(2026, 10, 12)
+    assert b"Monday" not in data
+
+
+def test_redis_save_and_load(resp_server):
+    backend = redis_backend(resp_server, ttl=60)
+    backend.save("abc", {"week": b"\x1f\x8bbinary", "goals": encode_goals({"Gym": "#000000"})})
+    backend.save("abc", {"goals": encode_goals({})})
+    assert backend.load("abc") == {"week": b"\x1f\x8bbinary", "goals": b"{}"}
+    assert backend.load("missing") == {}
+    assert resp_server.ttls[b"planner:session:abc"] == 60
+    assert [b"AUTH", b"secret"] in resp_server.commands and [b"SELECT", b"2"] in resp_server.commands
+
+    backend.delete("abc")
+    assert backend.load("abc") == {}
+    backend.close()
+
+
+def test_redis_pipelines_each_call(resp_server):
+    backend = redis_backend(resp_server)
+    backend.save("abc", {"week": b"1"})
+    resp_server.commands.clear()
+    backend.save("abc", {"week": b"2", "goals": b"{}"})
+    # HSET with every field, then EXPIRE, on the open connection
+    assert [command[0] for command in resp_server.commands] == [b"HSET", b"EXPIRE"]
+    backend.close()
+
+
+def test_redis_error_replies(resp_server):
+    with pytest.raises(RuntimeError, match="WRONGPASS"):
+        redis_backend(resp_server, password="wrong").load("abc")
+
+    backend = redis_backend(resp_server)
+    with pytest.raises(RuntimeError, match="unknown command"):
+        backend._execute([("NOPE",), ("HGETALL", "planner:session:abc")])
+    # Every reply of the failed pipeline was read, so the connection is still usable
+    backend.save("abc", {"week": b"1"})
+    assert backend.load("abc") == {"week": b"1"}
+    backend.close()
+
+
+def test_redis_reconnects_after_the_connection_drops(resp_server):
+    backend = redis_backend(resp_server)
+    backend.save("abc", {"week": b"1"})
+    resp_server.drop_connections()
+    assert backend.load("abc") == {"week": b"1"}
+    assert sum(command[0] == b"AUTH" for command in resp_server.commands) == 2
+    backend.close()
+
+
+def test_redis_down_raises_connection_error():
+    backend = backend_from_url("redis://127.0.0.1:1/0")
+    with pytest.raises(OSError):
+        backend.load("abc")
+
+
+def test_memory_backend_expires_untouched_sessions():
+    backend = MemoryBackend(ttl=0.05)
+    backend.save("old", {"week": b"1"})
+    time.sleep(0.1)
+    backend.save("new", {"week": b"2"})
+    assert backend.load("old") == {}
+    assert backend.load("new") == {"week": b"2"}
+    assert list(backend._sessions) == ["new"]
+
+
+def test_writer_coalesces_and_reads_its_queue():
+    backend = MemoryBackend()
+    writer = SessionWriter(backend, delay=0.05)
+    for value in range(20):
+        writer.save("abc", {"goals": encode_goals({"n": value})})
+    assert decode_goals(writer.load("abc")["goals"]) == {"n": 19}
+    assert writer.flush(5)
+    assert decode_goals(backend.load("abc")["goals"]) == {"n": 19}
+
+
+class FlakyBackend(MemoryBackend):
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+        self.attempts = 0
+
+    def save(self, session_id, fields):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise ConnectionError("store is down")
+        super().save(session_id, fields)
+
+
+def test_writer_retries_failed_writes(caplog):
+    backend = FlakyBackend(failures=2)
+    writer = SessionWriter(backend, delay=0, retries=3, retry_delay=0.01)
+    writer.save("abc", {"week": b"1"})
+    assert writer.flush(5)
+    assert backend.load("abc") == {"week": b"1"}
+    assert "attempt 2" in caplog.text
+
+
+def test_writer_gives_up_after_its_retries(caplog):
+    backend = FlakyBackend(failures=100)
+    writer = SessionWriter(backend, delay=0, retries=2, retry_delay=0.01)
+    writer.save("abc", {"week": b"1"})
+    assert writer.flush(5)
+    assert backend.attempts == 3
+    assert backend.load("abc") == {}
+    assert "Dropping changes to session abc" in caplog.text
@@ -0,0 +1,307 @@
+"""Template library: delta-encoded rows must always load back as the templates that were saved"""
+import io
+import json
+import random
+import sqlite3
+
+import pytest
+
+from planner import DAYS, Task, Template, Week, dump_templates, parse_templates
+from planner import importer
+from planner.importer import load_templates
+from planner.store import MAX_DELTA_DEPTH, TemplateStore
+
+COLORS = ["#4A90E2", "#7ED321", "#F5A623", "#D0021B"]
+
+
+def make_template(seed, created_at="2026-01-01 09:00:00"):
+    """A template whose days vary a little with seed, so neighbours share most of their content"""
+    rng = random.Random(seed)
+    week = Week()
+    goals = {}
+    for day in DAYS:
+        week.set_focus_hours(day, 8)
+        for i in range(3):
+            name = f"Goal {rng.randrange(6)}"
+            goals[name] = rng.choice(COLORS)
+            week.add_task(day, Task(rng.randrange(1, 3), name, goals[name]))
+    return Template.from_week(week, goals, created_at)
+
+
+def variant(template, seed, created_at):
+    """template with one day changed and, sometimes, one goal recoloured"""
+    rng = random.Random(seed)
+    week = template.to_week()
+    day = rng.choice(DAYS)
+    week.replace_day(day, rng.randrange(4, 10), [Task(rng.randrange(1, 4), f"Goal {rng.randrange(8)}", "#123456")])
+    goals = dict(template.goal_colors)
+    if goals and rng.random() < 0.5:
+        goals[rng.choice(sorted(goals))] = rng.choice(COLORS)
+    return Template.from_week(week, goals, created_at)
+
+
+def plain(template):
+    """A template as plain JSON values, so Task tuples and stored lists compare equal"""
+    return json.loads(json.dumps(template.to_dict()))
+
+
+def stored_rows(store):
+    return {name: (base, depth) for name, base, depth in store._execute("SELECT name, base, depth FROM templates")}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TemplateStore(str(tmp_path / "templates.db"))
+    yield store
+    store.close()
+
+
+def assert_library(store, expected):
+    assert store.names() == sorted(expected)
+    for name, template in expected.items():
+        assert plain(store.get(name)) == plain(template), name
+    assert {name: plain(template) for name, template in store.items()} == {
+        name: plain(template) for name, template in expected.items()
+    }
+
+
+def test_similar_templates_round_trip_as_deltas(store):
+    base = make_template(1)
+    expected = {"Routine": base}
+    store.save("Routine", base)
+    for i in range(5):
+        expected[f"Routine v{i}"] = variant(expected[f"Routine v{i - 1}"] if i else base, i, f"2026-01-0{i + 2} 09:00:00")
+        store.save(f"Routine v{i}", expected[f"Routine v{i}"])
+
+    rows = stored_rows(store)
+    assert rows["Routine"] == (None, 0)
+    assert all(rows[f"Routine v{i}"][0] is not None for i in range(5))
+    assert_library(store, expected)
+    assert store.summary("Routine v4")["total_tasks"] == expected["Routine v4"].total_tasks
+
+
+def test_save_many_uses_bases_from_the_same_batch(store):
+    base = make_template(2)
+    batch = {"Plan": base, "Plan b": variant(base, 1, base.created_at), "Plan c": variant(base, 2, base.created_at)}
+    store.save_many(batch)
+    assert stored_rows(store)["Plan b"][0] == "Plan"
+    assert_library(store, batch)
+
+
+def test_chains_stay_within_the_depth_cap(store):
+    expected = {}
+    template = make_template(3)
+    for i in range(3 * MAX_DELTA_DEPTH):
+        template = variant(template, i, f"2026-02-01 09:{i:02d}:00")
+        expected[f"Chain {i:02d}"] = template
+        store.save(f"Chain {i:02d}", template)
+    assert max(depth for _, depth in stored_rows(store).values()) <= MAX_DELTA_DEPTH
+    assert_library(store, expected)
+
+
+def test_chains_built_within_one_batch_stay_within_the_depth_cap(store):
+    batch = {}
+    template = make_template(13)
+    for i in range(3 * MAX_DELTA_DEPTH):
+        template = variant(template, i, "2026-02-02 09:00:00")
+        batch[f"Batch {i:02d}"] = template
+    store.save_many(batch)
+    assert max(depth for _, depth in stored_rows(store).values()) <= MAX_DELTA_DEPTH
+    assert_library(store, batch)
+
+
+def test_overwriting_a_base_keeps_its_children(store):
+    base = make_template(4)
+    child = variant(base, 1, "2026-01-02 09:00:00")
+    store.save("Week", base)
+    store.save("Week 2", child)
+    assert stored_rows(store)["Week 2"][0] == "Week"
+
+    replacement = make_template(99, "2026-01-03 09:00:00")
+    store.save("Week", replacement)
+    assert_library(store, {"Week": replacement, "Week 2": child})
+
+
+def test_deleting_a_base_keeps_its_children(store):
+    base = make_template(5)
+    child = variant(base, 1, "2026-01-02 09:00:00")
+    grandchild = variant(child, 2, "2026-01-03 09:00:00")
+    store.save_many({"Week": base, "Week 2": child, "Week 3": grandchild})
+
+    store.delete("Week 2")
+    assert_library(store, {"Week": base, "Week 3": grandchild})
+    store.delete("Week")
+    assert_library(store, {"Week 3": grandchild})
+
+
+def test_snapshot_and_restore_undo_saves_and_deletes(store):
+    base = make_template(6)
+    child = variant(base, 1, "2026-01-02 09:00:00")
+    store.save_many({"Week": base, "Week 2": child})
+
+    before = store.snapshot(["Week", "New"])
+    assert before["New"] is None
+    store.save("Week", make_template(7, "2026-01-05 09:00:00"))
+    store.save("New", variant(child, 3, "2026-01-06 09:00:00"))
+    store.restore(before)
+    assert_library(store, {"Week": base, "Week 2": child})
+
+    before = store.snapshot(["Week"])
+    store.delete("Week")
+    store.restore(before)
+    assert_library(store, {"Week": base, "Week 2": child})
+
+
+def test_restoring_a_base_keeps_children_saved_since_the_snapshot(store):
+    original = make_template(14)
+    store.save("Week", original)
+    before = store.snapshot(["Week"])
+
+    edited = variant(original, 1, "2026-01-02 09:00:00")
+    store.save("Week", edited)
+    child = variant(edited, 2, "2026-01-03 09:00:00")
+    store.save("Week 2", child)
+    assert stored_rows(store)["Week 2"][0] == "Week"
+
+    store.restore(before)
+    assert_library(store, {"Week": original, "Week 2": child})
+    store.restore({"Week": None})
+    assert_library(store, {"Week 2": child})
+
+
+def test_owners_have_libraries_of_their_own(store):
+    alice, bob = store.for_owner("alice"), store.for_owner("bob")
+    base = make_template(15)
+    alice.save_many({"Week": base, "Week 2": variant(base, 1, "2026-01-02 09:00:00")})
+    bob_week = make_template(16)
+    bob.save("Week", bob_week)
+    bob_child = variant(bob_week, 2, "2026-01-03 09:00:00")
+    bob.save("Week 3", bob_child)
+    # A delta is only ever stored against the owner's own templates
+    assert bob._execute("SELECT base FROM templates WHERE owner = 'bob' AND name = 'Week 3'") == [("Week",)]
+
+    version = bob.version()
+    before = alice.snapshot(["Week"])
+    alice.delete("Week")
+    alice.replace_all({"Other": make_template(17)})
+    alice.restore(before)
+    assert alice.names() == ["Other", "Week"]
+    assert bob.version() == version
+    assert_library(bob, {"Week": bob_week, "Week 3": bob_child})
+    assert len(store) == 0 and "Week" not in store
+
+
+def test_libraries_from_before_owners_are_kept(tmp_path):
+    path = str(tmp_path / "old.db")
+    template = make_template(18)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE templates (name TEXT PRIMARY KEY, created_at TEXT NOT NULL, total_tasks INTEGER NOT NULL,
+                                total_focus_hours INTEGER NOT NULL, data TEXT NOT NULL);
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        INSERT INTO meta (key, value) VALUES ('version', 3);
+    """)
+    conn.execute("INSERT INTO templates VALUES (?, ?, ?, ?, ?)", (
+        "Routine", template.created_at, template.total_tasks, template.total_focus_hours,
+        json.dumps(template.content()),
+    ))
+    conn.commit()
+    conn.close()
+
+    store = TemplateStore(path)
+    assert_library(store, {"Routine": template})
+    assert store.for_owner("abc").names() == []
+    store.save("Routine 2", variant(template, 1, "2026-01-02 09:00:00"))
+    assert stored_rows(store)["Routine 2"] == ("Routine", 1)
+    store.close()
+
+
+def test_replace_all(store):
+    store.save_many({"Old": make_template(8), "Old 2": make_template(9)})
+    base = make_template(10)
+    library = {"New": base, "New 2": variant(base, 1, base.created_at)}
+    version = store.version()
+    store.replace_all(library)
+    assert store.version() > version
+    assert_library(store, library)
+
+
+def test_randomized_operations_match_full_copies(store):
+    rng = random.Random(2026)
+    expected = {}
+    names = [f"{prefix} {i}" for prefix in ("Winter", "Summer") for i in range(6)]
+    for step in range(300):
+        created_at = f"2026-03-{1 + step // 60:02d} {step // 60:02d}:{step % 60:02d}:00"
+        operation = rng.choice(["save", "save", "save_many", "delete", "undo", "replace_all"])
+        if operation == "save" or (operation == "delete" and not expected):
+            name = rng.choice(names)
+            source = expected.get(rng.choice(names)) or make_template(step)
+            expected[name] = variant(source, step, created_at)
+            store.save(name, expected[name])
+        elif operation == "save_many":
+            batch = {}
+            for name in rng.sample(names, 3):
+                source = batch.get(rng.choice(names)) or expected.get(rng.choice(names)) or make_template(step)
+                batch[name] = variant(source, rng.randrange(10 ** 6), created_at)
+            store.save_many(batch)
+            expected.update(batch)
+        elif operation == "delete":
+            name = rng.choice(sorted(expected))
+            store.delete(name)
+            del expected[name]
+        elif operation == "undo":
+            touched = rng.sample(names, 2)
+            before = store.snapshot(touched)
+            for name in touched:
+                store.save(name, variant(make_template(step), step, created_at))
+            store.restore(before)
+        elif rng.random() < 0.2:
+            expected = {name: template for name, template in expected.items() if rng.random() < 0.7}
+            store.replace_all(expected)
+        if step % 25 == 0:
+            assert_library(store, expected)
+    assert_library(store, expected)
+    assert max((depth for _, depth in stored_rows(store).values()), default=0) <= MAX_DELTA_DEPTH
+
+
+@pytest.fixture
+def delta_library():
+    base = make_template(11)
+    library = {"Routine": base}
+    for i in range(6):
+        library[f"Routine {i}"] = variant(library[f"Routine {i - 1}"] if i else base, i, f"2026-04-0{i + 1} 09:00:00")
+    library["Other"] = make_template(12)
+    return library
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_delta_exports_import_on_both_parse_paths(monkeypatch, delta_library, compress):
+    data = dump_templates(delta_library.items(), compact=True, compress=compress)
+    raw = data if isinstance(data, bytes) else data.encode("utf-8")
+    if not compress:
+        entries = json.loads(raw)["templates"]
+        assert any("base" in entry for entry in entries.values())
+
+    expected = {name: plain(template) for name, template in delta_library.items()}
+
+    # Files below the streaming threshold are parsed whole; gzip files always stream
+    loaded = load_templates(io.BytesIO(raw), len(raw))
+    assert {name: plain(template) for name, template in loaded.items()} == expected
+
+    monkeypatch.setattr(importer, "STREAMING_IMPORT_BYTES", 0)
+    streamed = load_templates(io.BytesIO(raw), len(raw))
+    assert {name: plain(template) for name, template in streamed.items()} == expected
+
+
+def test_delta_export_round_trips_through_the_store(store, delta_library):
+    data = dump_templates(delta_library.items(), compact=True)
+    store.replace_all(parse_templates(json.loads(data)))
+    assert_library(store, delta_library)
+
+
+def test_unknown_base_is_rejected(delta_library):
+    data = json.loads(dump_templates(delta_library.items(), compact=True))
+    name = next(name for name, entry in data["templates"].items() if "base" in entry)
+    data["templates"] = {name: data["templates"][name]}
+    with pytest.raises(ValueError):
+        parse_templates(data)
@@ -1,11 +1,52 @@
 import streamlit as st
-import matplotlib.pyplot as plt
-import matplotlib.colors as mcolors
-import io
-import textwrap
-import re
+import pandas as pd
+import functools
 import json
-from datetime import datetime
+import logging
+import os
+import re
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from streamlit.errors import StreamlitAPIException
+
+from planner import (
+    COLOR_PALETTE,
+    COPY_MODES,
+    COPY_REPLACE,
+    DAYS,
+    FOCUS_MODES,
+    MAX_TASK_HOURS,
+    WEEKDAYS,
+    GoalIndex,
+    Task,
+    Template,
+    Week,
+    dump_templates,
+    schedule_digest,
+    tasks_from_rows,
+)
+from planner.history import DEFAULT_DEPTH, History, restore_goals
+from planner.horizon import Horizon
+from planner.importer import load_templates
+from planner.recurrence import Recurrence, week_start, week_view
+from planner.profiling import RerunProfile, activate, current_profile, fragment_profile, profiling_requested
+from planner.render import EXPORT_PROFILES
+from planner.session import (
+    SessionWriter,
+    backend_from_url,
+    decode_goals,
+    decode_horizon,
+    decode_recurrences,
+    decode_week,
+    encode_goals,
+    encode_horizon,
+    encode_recurrences,
+    encode_week,
+)
+from planner.store import TemplateStore
+
+logger = logging.getLogger(__name__)
 
 # --- App title ---
 st.markdown(
@@ -20,35 +61,218 @@ st.markdown(
 )
 
 # --- Config ---
-days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+days = DAYS
+
+# Number of rendered timeline images kept per session
+CHART_CACHE_SIZE = 8
+
+# Most weeks shown at once in the multi-week view
+MAX_WEEKS_SHOWN = 4
+
+# Template export formats: label -> (compact, gzip, file extension, mime type)
+EXPORT_FORMATS = {
+    "Readable": (False, False, "json", "application/json"),
+    "Compact": (True, False, "json", "application/json"),
+    "Compressed": (True, True, "json.gz", "application/gzip"),
+}
+
+# Server-rendered image, or a Vega-Lite spec drawn by the browser
+CHART_MODES = ["Image", "Interactive (browser)"]
+
+# Schedule export choices: label -> profile in planner.render.EXPORT_PROFILES
+EXPORT_PROFILE_LABELS = {
+    "Screen (PNG)": "screen",
+    "Print (PNG, 300 dpi)": "print",
+    "Vector (SVG)": "svg",
+    "Vector (PDF)": "pdf",
+}
+
+# Tasks shown per page in a day's task table
+TASK_PAGE_SIZE = 25
+
+# Template names listed per page when previewing an import
+IMPORT_PREVIEW_PAGE_SIZE = 20
+
+# Profiles of recent reruns shown in the debug expander
+PROFILE_HISTORY = 20
+
+def keep_profile(finished):
+    """Remember a finished rerun profile for the debug expander"""
+    history = st.session_state.get("profiles", [])
+    st.session_state.profiles = (history + [finished.to_dict()])[-PROFILE_HISTORY:]
+
+# Opt-in timing of each section (PLANNER_PROFILE=1 or ?profile=1)
+profile = activate(RerunProfile(profiling_requested(st.query_params), on_finish=keep_profile))
+
+# Chart fonts, matplotlib and the palette are prepared once per server process, not per session
+@st.cache_resource
+def warm_start():
+    """Warm up chart rendering and return the colour palette shared by every session"""
+    from planner.render import warm_up
+    
+    warm_up()
+    return COLOR_PALETTE
+
+with profile.section("warm_start"):
+    color_palette = warm_start()
+
+def profiled(name):
+    """Time a fragment body; when the fragment reruns on its own it gets a profile of its own"""
+    def decorate(body):
+        @functools.wraps(body)
+        def wrapper():
+            run_profile, standalone = fragment_profile(profiling_requested(st.query_params), keep_profile)
+            with run_profile.section(name):
+                body()
+            if standalone:
+                run_profile.finish()
+        return wrapper
+    return decorate
+
+# Slices of state each fragment reads. A nested fragment reruns with its parent.
+SECTION_DEPENDENCIES = {
+    "progress_overview": {"week_summary", "selected_day", "goals"},
+    "template_management": {"templates", "week_summary"},
+    "editor": {"week", "week_summary", "selected_day", "goals", "recurrences"},
+    "copy_panel": {"week", "selected_day"},
+    "undo_redo": {"history"},
+}
+SECTION_PARENTS = {"copy_panel": "editor"}
+
+def rerun_after(section, *changed):
+    """Rerun only the current fragment unless a section outside it reads one of the changed slices"""
+    persist(*changed)
+    changed = set(changed)
+    if "history" in changed and history_buttons() == st.session_state.get("history_buttons"):
+        # The undo and redo buttons would look just as they do now
+        changed.discard("history")
+    inside = {section} | {child for child, parent in SECTION_PARENTS.items() if parent == section}
+    if any(deps & changed for name, deps in SECTION_DEPENDENCIES.items() if name not in inside):
+        st.rerun()
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        # Fragment-scoped reruns are only allowed while the fragment itself is rerunning
+        st.rerun()
+
+# Session state is also kept in PLANNER_SESSION_STORE (memory://, sqlite:///<file> or
+# redis://<host>:<port>/<db>), keyed by the session id in the URL, so a session outlives
+# the process serving it and any replica can pick it up
+@st.cache_resource
+def session_writer():
+    return SessionWriter(backend_from_url(os.environ.get("PLANNER_SESSION_STORE", "memory://")))
+
+if "session_id" not in st.session_state:
+    with profile.section("session_load"):
+        session_id = st.query_params.get("session", "")
+        if not re.fullmatch(r"[0-9a-f]{32}", session_id):
+            session_id = uuid.uuid4().hex
+            st.query_params["session"] = session_id
+        # One batched read when the browser session starts; from then on session_state leads
+        try:
+            stored = session_writer().load(session_id)
+        except Exception:
+            logger.exception("Could not load session %s; starting an empty one", session_id)
+            st.warning("⚠️ Your saved schedule could not be loaded, so this is a new, empty one.")
+            # A new id keeps the stored session from being overwritten once the store is back
+            session_id = uuid.uuid4().hex
+            st.query_params["session"] = session_id
+            stored = {}
+        st.session_state.session_id = session_id
+        if "week" in stored:
+            st.session_state.week, st.session_state.view_week_start = decode_week(stored["week"])
+        if "goals" in stored:
+            st.session_state.goal_colors = decode_goals(stored["goals"])
+        if "recurrences" in stored:
+            st.session_state.recurrences = decode_recurrences(stored["recurrences"])
+        if "horizon" in stored:
+            st.session_state.horizon = decode_horizon(stored["horizon"])
+
+# Stored fields written when a slice of state changes; the week carries goal colours along,
+# since task edits may recolour a goal without changing how many there are
+PERSISTED_FIELDS = {
+    "week": ("week", "goals"),
+    "goals": ("goals",),
+    "recurrences": ("recurrences",),
+    "horizon": ("horizon",),
+}
+
+def persist(*changed):
+    """Queue the changed slices of state to be written behind the rerun"""
+    fields = {field for slice_name in changed for field in PERSISTED_FIELDS.get(slice_name, ())}
+    if not fields:
+        return
+    encoders = {
+        "week": lambda: encode_week(st.session_state.week, st.session_state.view_week_start),
+        "goals": lambda: encode_goals(st.session_state.goal_colors),
+        "recurrences": lambda: encode_recurrences(st.session_state.recurrences),
+        "horizon": lambda: encode_horizon(st.session_state.horizon),
+    }
+    session_writer().save(st.session_state.session_id, {field: encoders[field]() for field in fields})
 
-# Initialize focus_hours in session state
-if "focus_hours" not in st.session_state:
-    st.session_state.focus_hours = {day: 0 for day in days}
+# Storage for tasks and focus hours of every day
+if "week" not in st.session_state:
+    st.session_state.week = Week()
+week = st.session_state.week
 
 # Initialize selected_day in session state
 if "selected_day" not in st.session_state:
     st.session_state.selected_day = days[0]
 
-# Initialize form clearing flag
-if "clear_form" not in st.session_state:
-    st.session_state.clear_form = False
-
 # Initialize goal-color mapping and color palette
 if "goal_colors" not in st.session_state:
     st.session_state.goal_colors = {}
 
-# Storage for tasks
-if "tasks" not in st.session_state:
-    st.session_state.tasks = {day: [] for day in days}
-if "editing_day" not in st.session_state:
-    st.session_state.editing_day = None
-if "editing_index" not in st.session_state:
-    st.session_state.editing_index = None
+# Repeating tasks, kept as rules and expanded only for the week on screen
+if "recurrences" not in st.session_state:
+    st.session_state.recurrences = []
+if "view_week_start" not in st.session_state:
+    st.session_state.view_week_start = week_start(date.today())
+
+# Undo/redo of week and template changes, PLANNER_UNDO_DEPTH actions deep
+if "history" not in st.session_state:
+    st.session_state.history = History(int(os.environ.get("PLANNER_UNDO_DEPTH", DEFAULT_DEPTH)))
+history = st.session_state.history
+
+def current_goal_colors():
+    return st.session_state.goal_colors
+
+def current_recurrences():
+    return st.session_state.recurrences
+
+def history_buttons():
+    """The actions the undo and redo buttons offer, None where a button is disabled"""
+    return history.undo_label(), history.redo_label()
 
-# Initialize templates in session state
-if "templates" not in st.session_state:
-    st.session_state.templates = {}
+def reset_inputs():
+    """Recreate the task form and focus hour inputs from the week"""
+    if "form_key" not in st.session_state:
+        st.session_state.form_key = 0
+    st.session_state.form_key += 1
+    for day in days:
+        st.session_state.pop(f"focus_hours_{day}", None)
+
+# Weeks of the plan other than the one being edited, keyed by their Monday
+if "horizon" not in st.session_state:
+    st.session_state.horizon = Horizon()
+horizon = st.session_state.horizon
+
+def show_week(monday):
+    """Edit the week starting on monday, keeping the current one in the horizon"""
+    horizon.put(st.session_state.view_week_start, week)
+    week.load(horizon.load(monday))
+    st.session_state.view_week_start = monday
+    persist("horizon")
+    # Undo steps refer to days of the week they were recorded in
+    history.clear()
+    reset_inputs()
+
+# Template libraries persisted on disk, one per session, on a connection shared by all sessions
+@st.cache_resource
+def template_store():
+    return TemplateStore(os.environ.get("PLANNER_TEMPLATE_DB", "planner_templates.db"))
+
+templates = template_store().for_owner(st.session_state.session_id)
 
 # --- Weekly Progress Overview ---
 st.markdown("""
@@ -57,13 +281,14 @@ st.markdown("""
      border: 2px solid #39FF14;'>
 """, unsafe_allow_html=True)
 
-with st.expander("📊 Weekly Setup Progress", expanded=False):
-    # Calculate progress stats
+with st.expander("📊 Weekly Setup Progress", expanded=False), profile.section("progress_overview"):
+    # Progress stats are maintained by the week's mutations, so reading them is free
     total_days = len(days)
-    days_with_tasks = sum(1 for day in days if st.session_state.tasks.get(day, []))
-    days_with_focus_hours = sum(1 for day in days if st.session_state.focus_hours.get(day, 0) > 0)
-    total_tasks = sum(len(st.session_state.tasks.get(day, [])) for day in days)
-    total_focus_hours = sum(st.session_state.focus_hours.get(day, 0) for day in days)
+    days_with_tasks = week.days_with_tasks
+    days_with_focus_hours = week.days_with_focus_hours
+    total_tasks = week.total_tasks
+    total_focus_hours = week.total_focus_hours
+    selected_plan = week[st.session_state.selected_day]
 
     # Progress percentage
     progress_percentage = int((days_with_tasks / total_days) * 100)
@@ -92,14 +317,14 @@ with st.expander("📊 Weekly Setup Progress", expanded=False):
         st.metric(
             "Total Tasks", 
             total_tasks,
-            delta=f"+{len(st.session_state.tasks.get(st.session_state.selected_day, []))}" if st.session_state.tasks.get(st.session_state.selected_day, []) else None
+            delta=f"+{len(selected_plan.tasks)}" if selected_plan.tasks else None
         )
 
     with stat_col2:
         st.metric(
             "Focus Hours/Week", 
             f"{total_focus_hours}h",
-            delta=f"+{st.session_state.focus_hours.get(st.session_state.selected_day, 0)}h" if st.session_state.focus_hours.get(st.session_state.selected_day, 0) > 0 else None
+            delta=f"+{selected_plan.focus_hours}h" if selected_plan.focus_hours > 0 else None
         )
 
     with stat_col3:
@@ -121,8 +346,8 @@ with st.expander("📊 Weekly Setup Progress", expanded=False):
 
     for i, day in enumerate(days):
         with day_cols[i]:
-            tasks_count = len(st.session_state.tasks.get(day, []))
-            focus_hours = st.session_state.focus_hours.get(day, 0)
+            tasks_count = len(week[day].tasks)
+            focus_hours = week[day].focus_hours
             
             # Status emoji and color
             if tasks_count > 0 and focus_hours > 0:
@@ -166,730 +391,697 @@ with st.expander("📊 Weekly Setup Progress", expanded=False):
 
     st.markdown("</div>", unsafe_allow_html=True)
 
-# Calculate max_hours dynamically: if all focus hours are zero, set 12; else take max of focus_hours values.
-if all(v == 0 for v in st.session_state.focus_hours.values()):
-    max_hours = 12
-else:
-    max_hours = max(st.session_state.focus_hours.values())
-
-if "color_palette" not in st.session_state:
-    # Curated color palette that looks good together
-    st.session_state.color_palette = [
-        "#4A90E2",  # Blue
-        "#7ED321",  # Green  
-        "#F5A623",  # Orange
-        "#D0021B",  # Red
-        "#9013FE",  # Purple
-        "#50E3C2",  # Teal
-        "#B8E986",  # Light Green
-        "#FF6B6B",  # Coral
-        "#4ECDC4",  # Mint
-        "#45B7D1",  # Sky Blue
-        "#96CEB4",  # Sage
-        "#FFEAA7",  # Yellow
-        "#DDA0DD",  # Plum
-        "#87CEEB",  # Light Blue
-        "#F0A591"   # Peach
-    ]
+def goal_index():
+    """Session goal index, synced with the current goal_colors mapping"""
+    if "goal_index" not in st.session_state:
+        st.session_state.goal_index = GoalIndex()
+    st.session_state.goal_index.sync(st.session_state.goal_colors)
+    return st.session_state.goal_index
 
-def get_goal_color(task_name):
-    """Get color for a goal using fuzzy matching"""
-    
-    # Clean and normalize the task name for matching
-    clean_task = re.sub(r'[^\w\s]', '', task_name.lower().strip())
-    clean_words = set(clean_task.split())
-    
-    # Check existing goals for fuzzy match
-    for existing_goal, color in st.session_state.goal_colors.items():
-        clean_existing = re.sub(r'[^\w\s]', '', existing_goal.lower().strip())
-        existing_words = set(clean_existing.split())
-        
-        # If they share significant words, consider it a match
-        if clean_words and existing_words:
-            overlap = len(clean_words.intersection(existing_words))
-            min_words = min(len(clean_words), len(existing_words))
-            
-            # Match if at least 60% of words overlap or exact substring match
-            if (overlap / min_words >= 0.6) or (clean_task in clean_existing) or (clean_existing in clean_task):
-                return color
-    
-    # No match found, assign new color
-    color_index = len(st.session_state.goal_colors) % len(st.session_state.color_palette)
-    new_color = st.session_state.color_palette[color_index]
-    st.session_state.goal_colors[task_name] = new_color
-    return new_color
+def goal_color_hint(task_name):
+    """Colour of the goal a task name matches, or the next palette colour, without registering it"""
+    with current_profile().section("goal_matching"):
+        matched_goal = goal_index().match(task_name)
+    if matched_goal is not None:
+        return st.session_state.goal_colors[matched_goal]
+    return color_palette[len(st.session_state.goal_colors) % len(color_palette)]
 
 # --- Template Management ---
-with st.expander("💾 Template Management", expanded=False):
-    template_col1, template_col2 = st.columns([1, 1])
+@st.fragment
+@profiled("template_management")
+def template_management():
+    with st.expander("💾 Template Management", expanded=False):
+        template_col1, template_col2 = st.columns([1, 1])
 
-    with template_col1:
-        st.markdown("#### 📤 Save Current Week")
-        
-        # Check if week has any data
-        has_tasks = any(st.session_state.tasks.get(day, []) for day in days)
-        has_focus_hours = any(st.session_state.focus_hours.get(day, 0) > 0 for day in days)
+        with template_col1:
+            st.markdown("#### 📤 Save Current Week")
         
-        if has_tasks or has_focus_hours:
-            template_name = st.text_input(
-                "Template name:",
-                placeholder="e.g., 3-Month Goals, Winter Routine, Study Schedule",
-                key="template_name_input"
-            )
+            # Check if week has any data
+            if week.has_data():
+                template_name = st.text_input(
+                    "Template name:",
+                    placeholder="e.g., 3-Month Goals, Winter Routine, Study Schedule",
+                    key="template_name_input"
+                )
             
-            if st.button("💾 Save Template", use_container_width=True, type="primary"):
-                if template_name.strip():
-                    # Create template data
-                    template_data = {
-                        "tasks": dict(st.session_state.tasks),
-                        "focus_hours": dict(st.session_state.focus_hours),
-                        "goal_colors": dict(st.session_state.goal_colors),
-                        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        "total_tasks": sum(len(st.session_state.tasks.get(day, [])) for day in days),
-                        "total_focus_hours": sum(st.session_state.focus_hours.get(day, 0) for day in days)
-                    }
-                    
-                    st.session_state.templates[template_name.strip()] = template_data
-                    st.success(f"✅ Template '{template_name}' saved successfully!")
-                    st.rerun()
-                else:
-                    st.error("Please enter a template name.")
-        else:
-            st.info("💡 Add some tasks or focus hours to save a template.")
+                if st.button("💾 Save Template", use_container_width=True, type="primary"):
+                    if template_name.strip():
+                        # Create template data
+                        template = Template.from_week(week, st.session_state.goal_colors)
+                        with history.record("save template", week, store=templates, names=[template_name.strip()]):
+                            templates.save(template_name.strip(), template)
+                        st.success(f"✅ Template '{template_name}' saved successfully!")
+                        rerun_after("template_management", "templates", "history")
+                    else:
+                        st.error("Please enter a template name.")
+            else:
+                st.info("💡 Add some tasks or focus hours to save a template.")
 
-    with template_col2:
-        st.markdown("#### 📥 Load Template")
+        with template_col2:
+            st.markdown("#### 📥 Load Template")
         
-        if st.session_state.templates:
-            # Template selection
-            template_names = list(st.session_state.templates.keys())
-            selected_template = st.selectbox(
-                "Choose template:",
-                [""] + template_names,
-                key="template_selector"
-            )
+            template_names = templates.names()
+            if template_names:
+                # Template selection
+                selected_template = st.selectbox(
+                    "Choose template:",
+                    [""] + template_names,
+                    key="template_selector"
+                )
             
-            if selected_template:
-                template_data = st.session_state.templates[selected_template]
+                if selected_template:
+                    summary = templates.summary(selected_template)
                 
-                # Show template preview
-                st.markdown("**Preview:**")
-                st.write(f"📅 Created: {template_data['created_at']}")
-                st.write(f"📋 Tasks: {template_data['total_tasks']}")
-                st.write(f"⏰ Focus Hours: {template_data['total_focus_hours']}h/week")
+                    # Show template preview
+                    st.markdown("**Preview:**")
+                    st.write(f"📅 Created: {summary['created_at']}")
+                    st.write(f"📋 Tasks: {summary['total_tasks']}")
+                    st.write(f"⏰ Focus Hours: {summary['total_focus_hours']}h/week")
                 
-                # Load options
-                load_col1, load_col2 = st.columns(2)
+                    # Load options
+                    load_col1, load_col2 = st.columns(2)
                 
-                with load_col1:
-                    if st.button("📂 Load Template", use_container_width=True, type="primary"):
-                        # Load template data
-                        st.session_state.tasks = template_data["tasks"]
-                        st.session_state.focus_hours = template_data["focus_hours"]
-                        st.session_state.goal_colors = template_data["goal_colors"]
+                    with load_col1:
+                        if st.button("📂 Load Template", use_container_width=True, type="primary"):
+                            # Load template data
+                            template = templates.get(selected_template)
+                            with history.record("load template", week, days, goal_colors=current_goal_colors):
+                                week.load(template.to_week())
+                                st.session_state.goal_colors = dict(template.goal_colors)
                         
-                        # Reset editing state
-                        st.session_state.editing_day = None
-                        st.session_state.editing_index = None
-                        st.session_state.clear_form = True
-                        
-                        if "form_key" not in st.session_state:
-                            st.session_state.form_key = 0
-                        st.session_state.form_key += 1
-                        
-                        st.success(f"✅ Loaded template '{selected_template}'!")
-                        st.rerun()
+                            reset_inputs()
+                            st.success(f"✅ Loaded template '{selected_template}'!")
+                            rerun_after("template_management", "week", "week_summary", "goals", "history")
                 
-                with load_col2:
-                    if st.button("🗑️ Delete", use_container_width=True, type="secondary"):
-                        del st.session_state.templates[selected_template]
-                        st.success(f"🗑️ Deleted template '{selected_template}'")
-                        st.rerun()
-        else:
-            st.info("💡 No saved templates yet. Save your first template above!")
-
-    st.markdown("---")
-
-    # --- Import/Export ---
-    export_col1, export_col2 = st.columns([1, 1])
-
-    with export_col1:
-        st.markdown("#### 📤 Export Templates")
-        if st.session_state.templates:
-            # Create JSON export
-            export_data = {
-                "templates": st.session_state.templates,
-                "exported_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "app_version": "1.0"
-            }
+                    with load_col2:
+                        if st.button("🗑️ Delete", use_container_width=True, type="secondary"):
+                            with history.record("delete template", week, store=templates, names=[selected_template]):
+                                templates.delete(selected_template)
+                            st.success(f"🗑️ Deleted template '{selected_template}'")
+                            rerun_after("template_management", "templates", "history")
+            else:
+                st.info("💡 No saved templates yet. Save your first template above!")
+
+        st.markdown("---")
+
+        # --- Import/Export ---
+        export_col1, export_col2 = st.columns([1, 1])
+
+        with export_col1:
+            st.markdown("#### 📤 Export Templates")
+            if len(templates):
+                export_format = st.radio(
+                    "Format:", list(EXPORT_FORMATS), horizontal=True, key="export_format"
+                )
+                compact, compress, extension, mime = EXPORT_FORMATS[export_format]
             
-            json_string = json.dumps(export_data, indent=2)
+                # Serialize only on request, and reuse the bytes until the library changes
+                export_key = (templates.version(), export_format)
+                templates_export = st.session_state.get("templates_export")
+                if templates_export is None or templates_export[0] != export_key:
+                    if st.button("📦 Prepare Templates Export", use_container_width=True):
+                        data = dump_templates(templates.items(), compact=compact, compress=compress)
+                        current_profile().count("templates_export_bytes", len(data))
+                        st.session_state.templates_export = (export_key, data)
+                        templates_export = st.session_state.templates_export
             
-            st.download_button(
-                label="💾 Download Templates (.json)",
-                data=json_string,
-                file_name=f"focus_templates_{datetime.now().strftime('%Y%m%d')}.json",
-                mime="application/json",
-                use_container_width=True
+                if templates_export is not None and templates_export[0] == export_key:
+                    st.download_button(
+                        label=f"💾 Download Templates (.{extension})",
+                        data=templates_export[1],
+                        file_name=f"focus_templates_{datetime.now().strftime('%Y%m%d')}.{extension}",
+                        mime=mime,
+                        use_container_width=True
+                    )
+            else:
+                st.info("💡 No templates to export.")
+
+        with export_col2:
+            st.markdown("#### 📥 Import Templates")
+            uploaded_file = st.file_uploader(
+                "Choose templates file:",
+                type=['json', 'gz'],
+                key="template_uploader"
             )
-        else:
-            st.info("💡 No templates to export.")
-
-    with export_col2:
-        st.markdown("#### 📥 Import Templates")
-        uploaded_file = st.file_uploader(
-            "Choose templates file:",
-            type=['json'],
-            key="template_uploader"
-        )
         
-        if uploaded_file is not None:
-            try:
-                import_data = json.load(uploaded_file)
+            if uploaded_file is None:
+                st.session_state.pop("template_import", None)
+            else:
+                # Parse the upload once; later reruns reuse the result while the same file stays selected
+                import_key = (uploaded_file.file_id, uploaded_file.size)
+                parsed = st.session_state.get("template_import")
+                if parsed is None or parsed["key"] != import_key:
+                    parsed = {"key": import_key, "templates": None, "error": None}
+                    try:
+                        parsed["templates"] = load_templates(uploaded_file, uploaded_file.size)
+                    except Exception as e:
+                        parsed["error"] = str(e)
+                    st.session_state.template_import = parsed
+            
+                imported_templates = parsed["templates"]
+                if parsed["error"]:
+                    st.error(f"❌ Error reading file: {parsed['error']}")
+                else:
+                    # Show preview, one page of names at a time
+                    names = list(imported_templates)
+                    st.write(f"**Found {len(names)} templates:**")
+                    pages = max(1, -(-len(names) // IMPORT_PREVIEW_PAGE_SIZE))
+                    page = 1
+                    if pages > 1:
+                        page = st.number_input(f"Preview page (of {pages}):", 1, pages, key="import_preview_page")
+                    start = (page - 1) * IMPORT_PREVIEW_PAGE_SIZE
+                    st.markdown("\n".join(f"- {name}" for name in names[start:start + IMPORT_PREVIEW_PAGE_SIZE]))
                 
-                if "templates" in import_data:
-                    imported_templates = import_data["templates"]
-                    
-                    # Show preview
-                    st.write(f"**Found {len(imported_templates)} templates:**")
-                    for name in imported_templates.keys():
-                        st.write(f"• {name}")
-                    
                     import_col1, import_col2 = st.columns(2)
-                    
+                
                     with import_col1:
                         if st.button("📥 Import All", use_container_width=True):
                             # Merge templates (existing ones will be overwritten if same name)
-                            st.session_state.templates.update(imported_templates)
+                            with history.record("import templates", week, store=templates, names=imported_templates):
+                                templates.save_many(imported_templates)
                             st.success(f"✅ Imported {len(imported_templates)} templates!")
-                            st.rerun()
-                    
+                            rerun_after("template_management", "templates", "history")
+                
                     with import_col2:
                         if st.button("🔄 Replace All", use_container_width=True):
                             # Replace all templates
-                            st.session_state.templates = imported_templates
+                            replaced = set(templates.names()) | set(imported_templates)
+                            with history.record("replace templates", week, store=templates, names=replaced):
+                                templates.replace_all(imported_templates)
                             st.success(f"✅ Replaced with {len(imported_templates)} templates!")
-                            st.rerun()
-                else:
-                    st.error("❌ Invalid template file format.")
-            except Exception as e:
-                st.error(f"❌ Error reading file: {str(e)}")
+                            rerun_after("template_management", "templates", "history")
 
-    st.markdown("</div>", unsafe_allow_html=True)
-
-# --- Task Input ---
-with st.expander("Add or Edit Task", expanded=True):
-    st.subheader("Add or Edit a Task")
-    # Select day (rerun on change)
-    day = st.selectbox("Choose a day:", days, index=days.index(st.session_state.selected_day), key="day_select")
-    if day != st.session_state.selected_day:
-        st.session_state.selected_day = day
-        st.session_state.editing_day = None
-        st.session_state.editing_index = None
-        st.session_state.clear_form = True
-        st.rerun()
-
-    # Number input for focus hours for the selected day
-    focus_hours_val = st.number_input(
-        f"{day} Focus Hours:",
-        0, 24,
-        value=st.session_state.focus_hours.get(day, 0),
-        key=f"focus_hours_{day}"
-    )
-    st.session_state.focus_hours[day] = focus_hours_val
-    used = sum(task[0] for task in st.session_state.tasks.get(day, []))
-    remaining = focus_hours_val - used
-    if st.session_state.tasks.get(day, []):  # only show if there are tasks
-        if remaining >= 0:
-            st.success(f"Remaining: {remaining}h")
-        else:
-            st.error(f"Overbooked by {-remaining}h")
-
-    # Determine default values for form fields
-    if st.session_state.editing_day == day and st.session_state.editing_index is not None:
-        # Editing mode - use task values
-        task_to_edit = st.session_state.tasks[day][st.session_state.editing_index]
-        default_duration = task_to_edit[0]
-        default_task_name = task_to_edit[1]
-        default_color = task_to_edit[2]
-    elif st.session_state.clear_form:
-        # Clear form after submit or day change
-        default_duration = 1
-        default_task_name = ""
-        default_color = st.session_state.color_palette[0]  # First color as default
-        st.session_state.clear_form = False
-    else:
-        # Normal mode - keep current values or defaults
-        default_duration = 1
-        default_task_name = ""
-        default_color = st.session_state.color_palette[0]  # First color as default
-
-    # Task inputs wrapped in form to prevent accidental submissions
-    with st.form(key=f"task_form_{day}_{st.session_state.get('form_key', 0)}"):
-        task_name = st.text_input("Task name:", value=default_task_name)
-        duration = st.number_input("Duration (hours):", 1, max_hours, value=default_duration)
-        
-        # Auto-suggest color based on task name
-        if task_name and task_name.strip():
-            suggested_color = get_goal_color(task_name)
-        else:
-            suggested_color = st.session_state.color_palette[0]
-        
-        color = st.color_picker("Pick a color (Optional):", value=suggested_color)
-        
-        # Show matching info
-        if task_name and task_name.strip():
-            matched_goal = None
-            clean_task = re.sub(r'[^\w\s]', '', task_name.lower().strip())
-            clean_words = set(clean_task.split())
-            
-            for existing_goal in st.session_state.goal_colors.keys():
-                clean_existing = re.sub(r'[^\w\s]', '', existing_goal.lower().strip())
-                existing_words = set(clean_existing.split())
-                
-                if clean_words and existing_words:
-                    overlap = len(clean_words.intersection(existing_words))
-                    min_words = min(len(clean_words), len(existing_words))
-                    
-                    if (overlap / min_words >= 0.6) or (clean_task in clean_existing) or (clean_existing in clean_task):
-                        if existing_goal != task_name:  # Only show if it's different
-                            matched_goal = existing_goal
-                        break
-            
-            if matched_goal:
-                st.info(f"💡 Matched with existing goal: '{matched_goal}'")
-            elif task_name.strip() not in st.session_state.goal_colors:
-                st.success(f"✨ New goal detected - assigned fresh color")
-        
-        submit_btn = st.form_submit_button("Add Task" if st.session_state.editing_day is None else "Update Task")
+        st.markdown("</div>", unsafe_allow_html=True)
 
-        if submit_btn:
-            if not task_name:
-                st.error("Task name cannot be empty.")
-            else:
-                # Use the actual color from the picker, but update the goal mapping
-                final_color = color
-                if task_name.strip():
-                    st.session_state.goal_colors[task_name] = final_color
-                    
-                if st.session_state.editing_day == day and st.session_state.editing_index is not None:
-                    st.session_state.tasks[day][st.session_state.editing_index] = (duration, task_name, final_color)
-                    st.success(f"Updated {task_name} on {day} ({duration}h)")
-                else:
-                    st.session_state.tasks[day].append((duration, task_name, final_color))
-                    st.success(f"Added {task_name} on {day} ({duration}h)")
-                
-                # Clear form after submit
-                st.session_state.editing_day = None
-                st.session_state.editing_index = None
-                st.session_state.clear_form = True
-                # Increment form key to force widget recreation
-                if "form_key" not in st.session_state:
-                    st.session_state.form_key = 0
-                st.session_state.form_key += 1
-                st.rerun()
-
-# --- Tasks List for Selected Day ---
-with st.expander(f"Tasks for {st.session_state.selected_day}", expanded=True):
-    day = st.session_state.selected_day
-    tasks = st.session_state.tasks.get(day, [])
-    for idx, (duration, task_name, color) in enumerate(tasks):
-        col1, col2, col3 = st.columns([6,1,1])
-        with col1:
-            st.markdown(f"- {task_name} ({duration}h)")
-        with col2:
-            if st.button("Edit", key=f"edit_{day}_{idx}", type="primary", width="stretch"):
-                st.session_state.editing_day = day
-                st.session_state.editing_index = idx
-                st.session_state.clear_form = False
-                # Increment form key to force widget recreation with new values
-                if "form_key" not in st.session_state:
-                    st.session_state.form_key = 0
-                st.session_state.form_key += 1
-                st.rerun()
-        with col3:
-            if st.button("Del", key=f"delete_{day}_{idx}", type="secondary", width="stretch"):
-                st.session_state.tasks[day].pop(idx)
-                if st.session_state.editing_day == day and st.session_state.editing_index == idx:
-                    st.session_state.editing_day = None
-                    st.session_state.editing_index = None
-                    st.session_state.clear_form = True
-                    if "form_key" not in st.session_state:
-                        st.session_state.form_key = 0
-                    st.session_state.form_key += 1
-                st.rerun()
+template_management()
 
 # --- Copy Shortcuts ---
-if st.session_state.tasks.get(st.session_state.selected_day, []):  # Only show if current day has tasks
-    with st.expander("📋 Copy Tasks to Other Days", expanded=False):
-        st.subheader(f"Copy from {st.session_state.selected_day}")
-        
-        # Show current day's tasks with selection
-        current_tasks = st.session_state.tasks[st.session_state.selected_day]
-        st.write(f"**Select tasks to copy:**")
+@st.fragment
+@profiled("copy_panel")
+def copy_panel():
+    if week[st.session_state.selected_day].tasks:  # Only show if current day has tasks
+        with st.expander("📋 Copy Tasks to Other Days", expanded=False):
+            st.subheader(f"Copy from {st.session_state.selected_day}")
         
-        # Create checkboxes for each task
-        selected_tasks = []
-        for idx, (duration, task_name, color) in enumerate(current_tasks):
-            if st.checkbox(f"{task_name} ({duration}h)", key=f"copy_task_{idx}", value=True):
-                selected_tasks.append((duration, task_name, color))
+            # Show current day's tasks with selection
+            current_tasks = week[st.session_state.selected_day].tasks
+            st.write(f"**Select tasks to copy:**")
         
-        if not selected_tasks:
-            st.warning("⚠️ Select at least one task to copy.")
-            st.stop()  # Don't show copy options if no tasks selected
+            # Create checkboxes for each task
+            selected_tasks = []
+            for idx, (duration, task_name, color) in enumerate(current_tasks):
+                if st.checkbox(f"{task_name} ({duration}h)", key=f"copy_task_{idx}", value=True):
+                    selected_tasks.append(Task(duration, task_name, color))
         
-        st.write("---")
+            if not selected_tasks:
+                st.warning("⚠️ Select at least one task to copy.")
+            else:
+                st.write("---")
         
-        # Copy options in columns
-        col1, col2 = st.columns(2)
+                # Copy options in columns
+                col1, col2 = st.columns(2)
         
-        with col1:
-            st.write("**Quick Copy Options:**")
+                with col1:
+                    st.write("**Quick Copy Options:**")
             
-            if st.button("📅 Copy to All Weekdays (Mon-Fri)", use_container_width=True):
-                weekdays = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
-                copy_count = 0
-                for target_day in weekdays:
-                    if target_day != st.session_state.selected_day:
+                    if st.button("📅 Copy to All Weekdays (Mon-Fri)", use_container_width=True):
+                        targets = [target_day for target_day in WEEKDAYS if target_day != st.session_state.selected_day]
                         # Copy tasks and update focus hours
-                        st.session_state.tasks[target_day] = selected_tasks.copy()
-                        total_hours = sum(task[0] for task in selected_tasks)
-                        st.session_state.focus_hours[target_day] = total_hours
-                        copy_count += 1
+                        with history.record("copy tasks", week, targets):
+                            week.copy_tasks(selected_tasks, targets)
+                        copy_count = len(targets)
                 
-                if copy_count > 0:
-                    st.success(f"✅ Copied to {copy_count} weekdays!")
-                    st.rerun()
+                        if copy_count > 0:
+                            st.success(f"✅ Copied to {copy_count} weekdays!")
+                            rerun_after("copy_panel", "week", "week_summary", "history")
             
-            if st.button("📆 Copy to Entire Week", use_container_width=True):
-                copy_count = 0
-                for target_day in days:
-                    if target_day != st.session_state.selected_day:
+                    if st.button("📆 Copy to Entire Week", use_container_width=True):
+                        targets = [target_day for target_day in days if target_day != st.session_state.selected_day]
                         # Copy tasks and update focus hours
-                        st.session_state.tasks[target_day] = selected_tasks.copy()
-                        total_hours = sum(task[0] for task in selected_tasks)
-                        st.session_state.focus_hours[target_day] = total_hours
-                        copy_count += 1
+                        with history.record("copy tasks", week, targets):
+                            week.copy_tasks(selected_tasks, targets)
+                        copy_count = len(targets)
                 
-                if copy_count > 0:
-                    st.success(f"✅ Copied to all {copy_count} days!")
-                    st.rerun()
+                        if copy_count > 0:
+                            st.success(f"✅ Copied to all {copy_count} days!")
+                            rerun_after("copy_panel", "week", "week_summary", "history")
         
-        with col2:
-            st.write("**Select Specific Days:**")
+                with col2:
+                    st.write("**Select Specific Days:**")
             
-            # Multi-select for specific days
-            available_days = [day for day in days if day != st.session_state.selected_day]
-            selected_days = st.multiselect(
-                "Choose days to copy to:",
-                available_days,
-                key="copy_target_days"
-            )
+                    # Multi-select for specific days
+                    available_days = [day for day in days if day != st.session_state.selected_day]
+                    selected_days = st.multiselect(
+                        "Choose days to copy to:",
+                        available_days,
+                        key="copy_target_days"
+                    )
             
-            if selected_days and st.button("📝 Copy to Selected Days", use_container_width=True):
-                for target_day in selected_days:
-                    # Copy tasks and update focus hours
-                    st.session_state.tasks[target_day] = selected_tasks.copy()
-                    total_hours = sum(task[0] for task in selected_tasks)
-                    st.session_state.focus_hours[target_day] = total_hours
+                    if selected_days and st.button("📝 Copy to Selected Days", use_container_width=True):
+                        # Copy tasks and update focus hours
+                        with history.record("copy tasks", week, selected_days):
+                            week.copy_tasks(selected_tasks, selected_days)
                 
-                st.success(f"✅ Copied to: {', '.join(selected_days)}!")
-                st.rerun()
+                        st.success(f"✅ Copied to: {', '.join(selected_days)}!")
+                        rerun_after("copy_panel", "week", "week_summary", "history")
         
-        st.write("---")
+                st.write("---")
         
-        # Warning section
-        st.warning("""
-        ⚠️ **Note:** Copying will replace all existing tasks and focus hours on target days.
-        """)
+                # Warning section
+                st.warning("""
+                ⚠️ **Note:** Copying will replace all existing tasks and focus hours on target days.
+                """)
         
-        # Advanced options
-        with st.expander("⚙️ Advanced Copy Options", expanded=False):
-            st.write("**Copy Mode:**")
-            copy_mode = st.radio(
-                "How should copying work?",
-                ["Replace all tasks", "Add to existing tasks"],
-                key="copy_mode"
-            )
+                # Advanced options
+                with st.expander("⚙️ Advanced Copy Options", expanded=False):
+                    st.write("**Copy Mode:**")
+                    copy_mode = st.radio(
+                        "How should copying work?",
+                        COPY_MODES,
+                        key="copy_mode"
+                    )
             
-            st.write("**Focus Hours:**")
-            focus_mode = st.radio(
-                "How should focus hours be handled?",
-                ["Auto-calculate from copied tasks", "Keep existing focus hours", "Add to existing focus hours"],
-                key="focus_mode"
-            )
+                    st.write("**Focus Hours:**")
+                    focus_mode = st.radio(
+                        "How should focus hours be handled?",
+                        FOCUS_MODES,
+                        key="focus_mode"
+                    )
             
-            # Custom copy with advanced options
-            if st.button("🔧 Copy with Advanced Settings", use_container_width=True):
-                if selected_days:
-                    for target_day in selected_days:
-                        if copy_mode == "Replace all tasks":
-                            st.session_state.tasks[target_day] = selected_tasks.copy()
-                        else:  # Add to existing
-                            existing_tasks = st.session_state.tasks.get(target_day, [])
-                            st.session_state.tasks[target_day] = existing_tasks + selected_tasks.copy()
-                        
-                        # Handle focus hours based on mode
-                        copied_hours = sum(task[0] for task in selected_tasks)
-                        if focus_mode == "Auto-calculate from copied tasks":
-                            if copy_mode == "Replace all tasks":
-                                st.session_state.focus_hours[target_day] = copied_hours
-                            else:  # Add to existing
-                                existing_focus = st.session_state.focus_hours.get(target_day, 0)
-                                st.session_state.focus_hours[target_day] = existing_focus + copied_hours
-                        elif focus_mode == "Add to existing focus hours":
-                            existing_focus = st.session_state.focus_hours.get(target_day, 0)
-                            st.session_state.focus_hours[target_day] = existing_focus + copied_hours
-                        # "Keep existing focus hours" does nothing
+                    # Custom copy with advanced options
+                    if st.button("🔧 Copy with Advanced Settings", use_container_width=True):
+                        if selected_days:
+                            with history.record("copy tasks", week, selected_days):
+                                week.copy_tasks(selected_tasks, selected_days, copy_mode, focus_mode)
                     
-                    mode_text = "replaced" if copy_mode == "Replace all tasks" else "added to"
-                    st.success(f"✅ Tasks {mode_text} {', '.join(selected_days)} with advanced settings!")
-                    st.rerun()
-                else:
-                    st.error("Please select at least one day to copy to.")
-
-# --- Plot Schedule ---
-with st.container():
-    st.markdown("""
-    <div style='text-align: center; margin: 30px 0;'>
-        <h2 style='color: #39FF14; font-weight: 900; font-size: 2.2em; margin-bottom: 10px;'>
-            📊 Weekly Focus Schedule
-        </h2>
-        <p style='color: #888; font-size: 1.1em; margin: 0;'>
-            Swipe horizontally on mobile to view all hours
-        </p>
-    </div>
-    """, unsafe_allow_html=True)
+                            mode_text = "replaced" if copy_mode == COPY_REPLACE else "added to"
+                            st.success(f"✅ Tasks {mode_text} {', '.join(selected_days)} with advanced settings!")
+                            rerun_after("copy_panel", "week", "week_summary", "history")
+                        else:
+                            st.error("Please select at least one day to copy to.")
+
+                # Repeat rules cost the same for a quarter as for one week
+                with st.expander("🔁 Repeat Instead of Copying", expanded=False):
+                    repeat_days = st.multiselect(
+                        "Repeat on:",
+                        days,
+                        default=[day for day in WEEKDAYS if day != st.session_state.selected_day],
+                        key="repeat_days"
+                    )
+                    repeat_every = st.number_input("Every N weeks:", 1, 12, value=1, key="repeat_every")
+                    repeat_until = None
+                    if st.checkbox("Ends on a date", key="repeat_ends"):
+                        repeat_until = st.date_input(
+                            "Until:",
+                            value=st.session_state.view_week_start + timedelta(weeks=12),
+                            key="repeat_until"
+                        )
+                
+                    if st.button("🔁 Repeat Selected Tasks", use_container_width=True):
+                        if repeat_days:
+                            rules = [
+                                Recurrence(
+                                    task,
+                                    tuple(day for day in days if day in repeat_days),
+                                    st.session_state.view_week_start,
+                                    repeat_every,
+                                    repeat_until,
+                                )
+                                for task in selected_tasks
+                            ]
+                            with history.record("repeat tasks", week, recurrences=current_recurrences):
+                                st.session_state.recurrences = st.session_state.recurrences + rules
+                            st.success(f"✅ Repeating {len(rules)} tasks on {', '.join(repeat_days)}!")
+                            rerun_after("copy_panel", "recurrences", "history")
+                        else:
+                            st.error("Please select at least one day to repeat on.")
+
+def cached_png(key, render):
+    """Return the image cached under key, calling render only on a cache miss"""
+    if "chart_cache" not in st.session_state:
+        st.session_state.chart_cache = OrderedDict()
+    cache = st.session_state.chart_cache
     
-    fig, ax = plt.subplots(figsize=(20, 8))
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key]
     
-    # Bold dark theme
-    fig.patch.set_facecolor("#0A0A0A")
-    ax.set_facecolor("#1A1A1A")
+    png = render()
+    cache[key] = png
+    # Evict least recently shown charts so memory stays flat over long sessions
+    while len(cache) > CHART_CACHE_SIZE:
+        cache.popitem(last=False)
+    return png
+
+def cached_chart_png(view, max_hours):
+    """Return the timeline image for the week on screen, rendering only on a cache miss"""
+    from planner.render import render_chart_png
     
-    # Modern styling
-    ax.tick_params(colors="#FFFFFF", labelsize=12, width=2, length=6)
-    ax.set_xlabel("Hours", fontsize=16, fontweight="bold", color="#39FF14", labelpad=15)
-    ax.set_ylabel("")
+    return cached_png(schedule_digest(view.to_dict(), max_hours), lambda: render_chart_png(view, max_hours))
+
+def window_weeks(mondays):
+    """(title, week) for each Monday in the window, with repeating tasks; other weeks come from the horizon"""
+    rules = st.session_state.recurrences
+    active = st.session_state.view_week_start
+    return [
+        (f"Week of {monday:%b %d, %Y}", week_view(week if monday == active else horizon.peek(monday), rules, monday))
+        for monday in mondays
+    ]
+
+def cached_window_png(mondays):
+    """Return the stacked timelines of several weeks, rendering only when one of them changed"""
+    from planner.render import render_window_png
     
-    # Bold grid
-    ax.grid(axis="x", linestyle="-", alpha=0.2, color="#39FF14", linewidth=1.5)
-    ax.grid(axis="y", linestyle="--", alpha=0.1, color="#666666", linewidth=1)
+    # Stored weeks are identified by the hash of their serialized form, so unchanged ones are never loaded
+    active = st.session_state.view_week_start
+    key = schedule_digest(
+        "window",
+        [week.to_dict() if monday == active else horizon.digest(monday) for monday in mondays],
+        [monday.isoformat() for monday in mondays],
+        [rule.to_dict() for rule in st.session_state.recurrences],
+    )
     
-    # Neon border styling
-    for spine in ax.spines.values():
-        spine.set_color("#39FF14")
-        spine.set_linewidth(3)
+    def render():
+        weeks = window_weeks(mondays)
+        return render_window_png(weeks, max(shown.max_hours for _, shown in weeks))
     
-    # Hide top and right spines for cleaner look
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
+    return cached_png(key, render)
 
-    for i, day in enumerate(days):
-        allocated = st.session_state.focus_hours.get(day, 0)
-        tasks = st.session_state.tasks.get(day, [])
-        used = sum(task[0] for task in tasks)
-        
-        # Background allocated hours bar with gradient effect
-        if allocated > 0:
-            bg_bar = ax.barh(
-                y=i, width=allocated, left=0, height=0.7,
-                color="#2A2A2A", edgecolor="#444444", linewidth=2,
-                alpha=0.6, zorder=1
-            )
-        
-        cumulative_start = 0
-        for j, (duration, label, color) in enumerate(tasks):
-            # Bold color scheme
-            if used > allocated:
-                facecolor = "#FF4444"  # Bright red for overbooked
-                edgecolor = "#FFFFFF"
-                linewidth = 3
-                alpha = 0.9
+@st.fragment
+@profiled("editor")
+def editor():
+    """Task form, task list, copy panel and chart; task edits rerun only this part of the page"""
+    max_hours = week.max_hours
+    goal_count = len(st.session_state.goal_colors)
+    # The week on screen: the stored week plus the repeating tasks that fall inside it
+    view = week_view(week, st.session_state.recurrences, st.session_state.view_week_start)
+
+    # --- Week Navigation ---
+    monday = st.session_state.view_week_start
+    nav1, nav2, nav3, nav4 = st.columns([1, 4, 1, 1])
+    target = None
+    with nav1:
+        if st.button("◀", key="week_prev", help="Previous week", width="stretch"):
+            target = monday - timedelta(weeks=1)
+    with nav2:
+        st.markdown(
+            f"<div style='text-align: center; font-size: 1.3em; font-weight: bold; color: #39FF14;'>"
+            f"Week of {monday:%b %d, %Y}</div>",
+            unsafe_allow_html=True
+        )
+    with nav3:
+        if st.button("Today", key="week_today", width="stretch"):
+            target = week_start(date.today())
+    with nav4:
+        if st.button("▶", key="week_next", help="Next week", width="stretch"):
+            target = monday + timedelta(weeks=1)
+    if target is not None and target != monday:
+        show_week(target)
+        rerun_after("editor", "week", "week_summary")
+
+    # --- Task Input ---
+    with st.expander("Add Task", expanded=True), current_profile().section("task_form"):
+        st.subheader("Add a Task")
+        # Select day (rerun on change)
+        day = st.selectbox("Choose a day:", days, index=days.index(st.session_state.selected_day), key="day_select")
+        if day != st.session_state.selected_day:
+            st.session_state.selected_day = day
+            rerun_after("editor", "selected_day")
+
+        # Number input for focus hours for the selected day
+        focus_hours_val = st.number_input(
+            f"{day} Focus Hours:",
+            0, 24,
+            value=week[day].focus_hours,
+            key=f"focus_hours_{day}"
+        )
+        if focus_hours_val != week[day].focus_hours:
+            with history.record("set focus hours", week, [day]):
+                week.set_focus_hours(day, focus_hours_val)
+            rerun_after("editor", "week", "week_summary", "history")
+        remaining = view[day].remaining_hours
+        if view[day].tasks:  # only show if there are tasks
+            if remaining >= 0:
+                st.success(f"Remaining: {remaining}h")
             else:
-                # Make colors more vibrant
-                rgb = mcolors.hex2color(color)
-                # Increase saturation
-                hsv = mcolors.rgb_to_hsv(rgb)
-                hsv[1] = min(1.0, hsv[1] * 1.0)  # Boost saturation
-                hsv[2] = min(1.0, hsv[2] * 1.1)  # Slight brightness boost
-                vibrant_color = mcolors.hsv_to_rgb(hsv)
-                facecolor = vibrant_color
-                edgecolor = "#FFFFFF"
-                linewidth = 2
-                alpha = 0.95
-            
-            # Create bar with rounded corners effect
-            bar = ax.barh(
-                y=i, width=duration, left=cumulative_start, height=0.7,
-                color=facecolor, edgecolor=edgecolor, linewidth=linewidth,
-                alpha=alpha, zorder=2
-            )
-            
-            # Bold text styling
-            full_label = f"{label}\n({duration}h)"
-            wrapped_label = textwrap.fill(full_label, width=35)
-            
-            # Add shadow effect to text
-            shadow_offset = 0.02
-            ax.text(
-                cumulative_start + duration/2 + shadow_offset, i - shadow_offset,
-                wrapped_label,
-                ha="center", va="center", color="#000000",
-                fontsize=14, fontweight="bold", alpha=0, zorder=3, backgroundcolor="#00000022"
-            )
-            
-            # Main text
-            text_color = "#FFFFFF" if sum(mcolors.hex2color(color))/3 < 0.5 else "#000000"
-            ax.text(
-                cumulative_start + duration/2, i,
-                wrapped_label,
-                ha="center", va="center", color=text_color,
-                fontsize=14, fontweight="900", zorder=4, backgroundcolor="#00000022"
-            )
-            cumulative_start += duration
+                st.error(f"Overbooked by {-remaining}h")
 
-    # Bold day labels
-    ax.set_yticks(range(len(days)))
-    ax.set_yticklabels([f"💪 {day}" for day in days], fontsize=14, fontweight="bold", color="#FFFFFF")
-    
-    # Bold hour markers
-    ax.set_xticks(range(0, max_hours+1, 2))  # Every 2 hours for cleaner look
-    ax.set_xlim(0, max_hours)
-    ax.invert_yaxis()
-    
-    # Add subtle background pattern
-    for i in range(len(days)):
-        if i % 2 == 0:
-            ax.axhspan(i-0.4, i+0.4, alpha=0.05, color="#39FF14", zorder=0)
-
-    plt.tight_layout(pad=2.0)
-    st.pyplot(fig, use_container_width=True)
-
-    # Bold download section
-    st.markdown("""
-    <div style='text-align: center; margin: 20px 0;'>
-    """, unsafe_allow_html=True)
-    
-    col1, col2, col3 = st.columns([1, 2, 1])
-    with col2:
-        # Export complete section as PNG including heading
-        buf = io.BytesIO()
-        
-        # Create new figure with heading - increased height for proper spacing
-        complete_fig = plt.figure(figsize=(25, 12))
-        complete_fig.patch.set_facecolor("#0A0A0A")
+        # Task inputs wrapped in form to prevent accidental submissions; a new form key clears them
+        with st.form(key=f"task_form_{day}_{st.session_state.get('form_key', 0)}"):
+            task_name = st.text_input("Task name:")
+            duration = st.number_input("Duration (hours):", 1, MAX_TASK_HOURS, value=1)
         
-        # Add title at top with more space
-        complete_fig.suptitle("Weekly Focus Schedule", 
-                            fontsize=28, fontweight='bold', color='#39FF14', y=0.95)
-        
-        # Create subplot for the main chart - moved down to give title more room
-        ax = complete_fig.add_subplot(111)
-        ax.set_position([0.08, 0.08, 0.85, 0.8])  # [left, bottom, width, height]
+            # Auto-suggest color based on task name; the goal is only added with the task
+            if task_name and task_name.strip():
+                suggested_color = goal_color_hint(task_name)
+            else:
+                suggested_color = color_palette[0]
         
-        # Copy all the chart styling
-        ax.set_facecolor("#1A1A1A")
-        ax.tick_params(colors="#FFFFFF", labelsize=12, width=2, length=6)
-        ax.set_xlabel("Hours", fontsize=16, fontweight="bold", color="#39FF14", labelpad=15)
-        ax.set_ylabel("")
-        ax.grid(axis="x", linestyle="-", alpha=0.2, color="#39FF14", linewidth=1.5)
-        ax.grid(axis="y", linestyle="--", alpha=0.1, color="#666666", linewidth=1)
+            color = st.color_picker("Pick a color (Optional):", value=suggested_color)
         
-        for spine in ax.spines.values():
-            spine.set_color("#39FF14")
-            spine.set_linewidth(3)
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
-
-        # Recreate all the bars and data
-        for i, day in enumerate(days):
-            allocated = st.session_state.focus_hours.get(day, 0)
-            tasks = st.session_state.tasks.get(day, [])
-            used = sum(task[0] for task in tasks)
-            
-            if allocated > 0:
-                ax.barh(y=i, width=allocated, left=0, height=0.7,
-                       color="#2A2A2A", edgecolor="#444444", linewidth=2,
-                       alpha=0.6, zorder=1)
+            # Show matching info
+            if task_name and task_name.strip():
+                with current_profile().section("goal_matching"):
+                    matched_goal = goal_index().match(task_name)
+                if matched_goal == task_name:  # Only show if it's different
+                    matched_goal = None
             
-            cumulative_start = 0
-            for j, (duration, label, color) in enumerate(tasks):
-                if used > allocated:
-                    facecolor = "#FF4444"
-                    edgecolor = "#FFFFFF"
-                    linewidth = 3
-                    alpha = 0.9
+                if matched_goal:
+                    st.info(f"💡 Matched with existing goal: '{matched_goal}'")
+                elif task_name.strip() not in st.session_state.goal_colors:
+                    st.success(f"✨ New goal detected - assigned fresh color")
+        
+            submit_btn = st.form_submit_button("Add Task")
+
+            if submit_btn:
+                if not task_name:
+                    st.error("Task name cannot be empty.")
                 else:
-                    rgb = mcolors.hex2color(color)
-                    hsv = mcolors.rgb_to_hsv(rgb)
-                    hsv[1] = min(1.0, hsv[1] * 1.4)
-                    hsv[2] = min(1.0, hsv[2] * 1.1)
-                    vibrant_color = mcolors.hsv_to_rgb(hsv)
-                    facecolor = vibrant_color
-                    edgecolor = "#FFFFFF"
-                    linewidth = 2
-                    alpha = 0.95
-                
-                ax.barh(y=i, width=duration, left=cumulative_start, height=0.7,
-                       color=facecolor, edgecolor=edgecolor, linewidth=linewidth,
-                       alpha=alpha, zorder=2)
-                
-                full_label = f"{label}\n({duration}h)"
-                wrapped_label = textwrap.fill(full_label, width=35)
-                
-                shadow_offset = 0.02
-                ax.text(cumulative_start + duration/2 + shadow_offset, i - shadow_offset,
-                       wrapped_label, ha="center", va="center", color="#000000",
-                       fontsize=14, fontweight="bold", alpha=0, zorder=3, backgroundcolor="#00000022")
+                    # Use the actual color from the picker, but update the goal mapping
+                    final_color = color
+                    with history.record("add task", week, [day], goal_colors=current_goal_colors, goals=[task_name]):
+                        if task_name.strip():
+                            st.session_state.goal_colors[task_name] = final_color
+                        week.add_task(day, Task(duration, task_name, final_color))
+                    st.success(f"Added {task_name} on {day} ({duration}h)")
+                    changed = ["week", "week_summary", "history"]
+                    if len(st.session_state.goal_colors) != goal_count:
+                        changed.append("goals")
                 
-                text_color = "#FFFFFF" if sum(mcolors.hex2color(color))/3 < 0.5 else "#000000"
-                ax.text(cumulative_start + duration/2, i, wrapped_label,
-                       ha="center", va="center", color=text_color,
-                       fontsize=14, fontweight="900", zorder=4, backgroundcolor="#00000022")
-                cumulative_start += duration
-
-        ax.set_yticks(range(len(days)))
-        ax.set_yticklabels([f"💪 {day}" for day in days], fontsize=14, fontweight="bold", color="#FFFFFF")
-        ax.set_xticks(range(0, max_hours+1, 2))
-        ax.set_xlim(0, max_hours)
-        ax.invert_yaxis()
-        
-        for i in range(len(days)):
-            if i % 2 == 0:
-                ax.axhspan(i-0.4, i+0.4, alpha=0.05, color="#39FF14", zorder=0)
-        
-        complete_fig.savefig(buf, format="png", dpi=300, bbox_inches='tight', 
-                           facecolor="#0A0A0A", edgecolor='none')
-        buf.seek(0)
-        plt.close(complete_fig)  # Close to free memory
-        
-        st.download_button(
-            label="🚀 Download Schedule as PNG",
-            data=buf,
-            file_name="my_focus_schedule.png",
-            mime="image/png",
-            use_container_width=True
+                    # Increment form key to clear the form
+                    if "form_key" not in st.session_state:
+                        st.session_state.form_key = 0
+                    st.session_state.form_key += 1
+                    rerun_after("editor", *changed)
+
+    # --- Tasks List for Selected Day ---
+    with st.expander(f"Tasks for {st.session_state.selected_day}", expanded=True), current_profile().section("task_list"):
+        day = st.session_state.selected_day
+        tasks = week[day].tasks
+        # The day's tasks as an editable table, a page at a time; adds, edits, deletes and
+        # reorders are collected by the form and applied together as one change
+        pages = max(1, -(-len(tasks) // TASK_PAGE_SIZE))
+        page = 1
+        if pages > 1:
+            page = st.number_input(f"Page (of {pages}):", 1, pages, key=f"task_page_{day}")
+        start = (page - 1) * TASK_PAGE_SIZE
+        page_tasks = tasks[start:start + TASK_PAGE_SIZE]
+        rows = pd.DataFrame(
+            [(start + offset + 1, name, duration, color) for offset, (duration, name, color) in enumerate(page_tasks)],
+            columns=["order", "task", "hours", "color"],
         )
+        with st.form(key=f"task_table_{day}_{page}_{st.session_state.get('form_key', 0)}"):
+            edited = st.data_editor(
+                rows,
+                num_rows="dynamic",
+                hide_index=True,
+                width="stretch",
+                column_config={
+                    "order": st.column_config.NumberColumn("Order", help="Change to move a task", step=1),
+                    "task": st.column_config.TextColumn("Task", required=True),
+                    "hours": st.column_config.NumberColumn(
+                        "Hours", min_value=1, max_value=MAX_TASK_HOURS, step=1, required=True
+                    ),
+                    "color": st.column_config.TextColumn(
+                        "Color", help="Hex colour such as #4A90E2; leave blank to use the goal's colour"
+                    ),
+                },
+            )
+            apply_edits = st.form_submit_button("💾 Apply Changes")
+
+        if apply_edits:
+            edited_rows = edited.to_dict("records")
+            for row in edited_rows:
+                if isinstance(row["task"], str) and row["task"].strip() and not isinstance(row["color"], str):
+                    row["color"] = goal_color_hint(row["task"].strip())
+            new_tasks, errors = tasks_from_rows(edited_rows)
+            for error in errors:
+                st.error(error)
+            if not errors and new_tasks != page_tasks:
+                # Added and edited rows set their goal's colour, as the task form does
+                recolored = set(new_tasks) - set(page_tasks)
+                summary = (week.total_tasks, week.days_with_tasks)
+                with history.record("edit tasks", week, [day], goal_colors=current_goal_colors,
+                                    goals=[task.name for task in recolored]):
+                    for task in recolored:
+                        st.session_state.goal_colors[task.name] = task.color
+                    week.replace_day(day, week[day].focus_hours, tasks[:start] + new_tasks + tasks[start + len(page_tasks):])
+                reset_inputs()
+                # Renames, recolours and reorders leave the progress overview as it is
+                changed = ["week", "history"]
+                if (week.total_tasks, week.days_with_tasks) != summary:
+                    changed.append("week_summary")
+                if len(st.session_state.goal_colors) != goal_count:
+                    changed.append("goals")
+                rerun_after("editor", *changed)
+
+        # Repeating tasks falling on this day of the week on screen
+        day_date = st.session_state.view_week_start + timedelta(days=days.index(day))
+        for rule_idx, rule in enumerate(st.session_state.recurrences):
+            if next(rule.occurrences(day_date, day_date + timedelta(days=1)), None) is None:
+                continue
+            col1, col2 = st.columns([6, 2])
+            with col1:
+                st.markdown(f"- 🔁 {rule.describe()}")
+            with col2:
+                if st.button("Stop", key=f"stop_rule_{rule_idx}", type="secondary", width="stretch"):
+                    with history.record("stop repeating", week, recurrences=current_recurrences):
+                        st.session_state.recurrences = [
+                            other for idx, other in enumerate(st.session_state.recurrences) if idx != rule_idx
+                        ]
+                    rerun_after("editor", "recurrences", "history")
+
+    copy_panel()
+
+    # --- Plot Schedule ---
+    with st.container():
+        st.markdown("""
+        <div style='text-align: center; margin: 30px 0;'>
+            <h2 style='color: #39FF14; font-weight: 900; font-size: 2.2em; margin-bottom: 10px;'>
+                📊 Weekly Focus Schedule
+            </h2>
+            <p style='color: #888; font-size: 1.1em; margin: 0;'>
+                Swipe horizontally on mobile to view all hours
+            </p>
+        </div>
+        """, unsafe_allow_html=True)
     
-    st.markdown("</div>", unsafe_allow_html=True)
+        chart_col1, chart_col2 = st.columns([3, 1])
+        with chart_col1:
+            chart_mode = st.radio("Chart rendering:", CHART_MODES, horizontal=True, key="chart_mode")
+        with chart_col2:
+            weeks_shown = st.number_input("Weeks shown:", 1, MAX_WEEKS_SHOWN, value=1, key="weeks_shown")
+        with current_profile().section("chart"):
+            # Only the weeks in the window are loaded and drawn, however long the plan is
+            mondays = horizon.window(monday, weeks_shown)
+            if chart_mode == CHART_MODES[0]:
+                if weeks_shown == 1:
+                    st.image(cached_chart_png(view, max_hours), width="stretch")
+                else:
+                    st.image(cached_window_png(mondays), width="stretch")
+            else:
+                # The browser draws the chart from a small JSON spec; no matplotlib on the server
+                from planner.vega import week_to_vega_lite
+                
+                if weeks_shown == 1:
+                    st.vega_lite_chart(week_to_vega_lite(view, max_hours), width="stretch", theme=None)
+                else:
+                    for title, shown in window_weeks(mondays):
+                        st.markdown(f"**{title}**")
+                        st.vega_lite_chart(week_to_vega_lite(shown, shown.max_hours), width="stretch", theme=None)
+
+        # Bold download section
+        st.markdown("""
+        <div style='text-align: center; margin: 20px 0;'>
+        """, unsafe_allow_html=True)
+    
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col2, current_profile().section("export"):
+            # Export is rendered on demand and reused while the week and profile are unchanged
+            profile_label = st.selectbox("Export as:", list(EXPORT_PROFILE_LABELS), key="export_profile")
+            export_profile = EXPORT_PROFILE_LABELS[profile_label]
+            fmt, _, mime = EXPORT_PROFILES[export_profile]
+            export_key = schedule_digest(view.to_dict(), st.session_state.goal_colors, export_profile)
+            
+            schedule_export = st.session_state.get("schedule_export")
+            if schedule_export is None or schedule_export[0] != export_key:
+                if st.button("🖼️ Prepare Schedule Export", use_container_width=True):
+                    from planner.render import render_export_profile
+                    
+                    # Only the latest export is kept, so a session never holds more than one image
+                    st.session_state.schedule_export = (
+                        export_key, render_export_profile(view, max_hours, export_profile)
+                    )
+                    schedule_export = st.session_state.schedule_export
+            
+            if schedule_export is not None and schedule_export[0] == export_key:
+                st.download_button(
+                    label=f"🚀 Download Schedule as {fmt.upper()}",
+                    data=schedule_export[1],
+                    file_name=f"my_focus_schedule.{fmt}",
+                    mime=mime,
+                    use_container_width=True
+                )
+    
+        st.markdown("</div>", unsafe_allow_html=True)
+
+editor()
 
 st.markdown("""
 <div style='text-align: center; margin: 20px 0;'>
 """, unsafe_allow_html=True)
 
 col1, col2, col3 = st.columns([1, 2, 1])
-with col2:
+# Actions inside fragments rerun the whole page only when these buttons would change
+st.session_state.history_buttons = history_buttons()
+with col1, profile.section("history"):
+    if st.button("↩️ Undo", use_container_width=True, disabled=not history.can_undo(),
+                 help=f"Undo {history.undo_label()}" if history.can_undo() else None):
+        change = history.undo(week, templates)
+        if change.goal_colors is not None:
+            st.session_state.goal_colors = restore_goals(st.session_state.goal_colors, change.goal_colors, 0)
+        if change.recurrences is not None:
+            st.session_state.recurrences = list(change.recurrences[0])
+        reset_inputs()
+        persist("week", "recurrences")
+        st.rerun()
+with col3, profile.section("history"):
+    if st.button("↪️ Redo", use_container_width=True, disabled=not history.can_redo(),
+                 help=f"Redo {history.redo_label()}" if history.can_redo() else None):
+        change = history.redo(week, templates)
+        if change.goal_colors is not None:
+            st.session_state.goal_colors = restore_goals(st.session_state.goal_colors, change.goal_colors, 1)
+        if change.recurrences is not None:
+            st.session_state.recurrences = list(change.recurrences[1])
+        reset_inputs()
+        persist("week", "recurrences")
+        st.rerun()
+with col2, profile.section("reset"):
     if st.button("🗑️ Reset Schedule", use_container_width=True, type="secondary"):
-        st.session_state.tasks = {day: [] for day in days}
-        st.session_state.focus_hours = {day: 0 for day in days}
+        # A blank schedule has no repeating tasks either; undo brings them back
+        with history.record("reset", week, days, recurrences=current_recurrences):
+            week.clear()
+            st.session_state.recurrences = []
         st.session_state.selected_day = days[0]
-        st.session_state.editing_day = None
-        st.session_state.editing_index = None
-        st.session_state.clear_form = True
-        if "form_key" not in st.session_state:
-            st.session_state.form_key = 0
-        st.session_state.form_key += 1
+        reset_inputs()
+        persist("week", "recurrences")
         st.rerun()
 
-st.markdown("</div>", unsafe_allow_html=True)
\ No newline at end of file
+st.markdown("</div>", unsafe_allow_html=True)
+
+# --- Profiling ---
+if profile.enabled:
+    profile.finish()
+    
+    with st.expander("🛠️ Debug: Rerun Profile", expanded=False):
+        latest = st.session_state.profiles[-1]
+        st.write(f"**Total:** {latest['total_s'] * 1000:.1f} ms")
+        st.table({name: f"{seconds * 1000:.1f} ms" for name, seconds in latest["sections_s"].items()})
+        if latest["counters"]:
+            st.json(latest["counters"])
+        st.download_button(
+            label="Download recent profiles (.jsonl)",
+            data="\n".join(json.dumps(entry) for entry in st.session_state.profiles),
+            file_name="rerun_profiles.jsonl",
+            mime="application/json"
+        )